@@ -5,34 +5,54 @@ This script demonstrates the system's functionality without requiring an API key
 It uses mock responses to show how the system works.
 """
 
-from unittest.mock import Mock, patch
+import contextlib
+import functools
+import io
+import json
+import sys
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
 from src.measure_uncertainty import UncertaintyMeasurer
 
 
+def buffered_output(func):
+    """Collect everything a demo prints and write it to stdout in one go."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        buf = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(buf):
+                return func(*args, **kwargs)
+        finally:
+            sys.stdout.write(buf.getvalue())
+            sys.stdout.flush()
+    return wrapper
+
+
 def create_mock_response(text, logprob=-0.1):
     """Create a mock OpenAI API response."""
-    mock_response = Mock()
-    mock_choice = Mock()
-    mock_message = Mock()
-    mock_message.content = text
-    
-    # Create mock logprobs
-    mock_logprobs = Mock()
-    mock_content = []
-    for _ in range(len(text.split())):  # One token per word for simplicity
-        token_logprob = Mock()
-        token_logprob.logprob = logprob
-        mock_content.append(token_logprob)
-    
-    mock_logprobs.content = mock_content
-    mock_choice.logprobs = mock_logprobs
-    mock_choice.message = mock_message
-    mock_response.choices = [mock_choice]
-    
-    return mock_response
+    # Plain data containers; the call-recording machinery of Mock is not
+    # needed for responses. One token per word, the measurer converts them to
+    # its own column-wise storage.
+    mock_choice = SimpleNamespace(
+        message=SimpleNamespace(content=text),
+        logprobs=SimpleNamespace(content=[
+            SimpleNamespace(token=word, logprob=logprob) for word in text.split()
+        ])
+    )
+    return SimpleNamespace(choices=[mock_choice])
 
 
-def demo_low_uncertainty():
+def create_mock_raw_response(text, logprob=-0.1):
+    """Create a mock raw API response, as read by the uncertainty-phrase probes."""
+    body = {"choices": [{"logprobs": {"content": [
+        {"token": word, "logprob": logprob} for word in text.split()
+    ]}}]}
+    return SimpleNamespace(content=json.dumps(body).encode("utf-8"))
+
+
+@buffered_output
+def demo_low_uncertainty(measurer, mock_client):
     """Demonstrate low uncertainty (confident response)."""
     print("=" * 80)
     print("DEMO 1: CONFIDENT RESPONSE - High Certainty Ratio")
@@ -56,41 +76,44 @@ def demo_low_uncertainty():
         "I need help with this"
     ]
     
-    with patch('src.measure_uncertainty.OpenAI') as mock_openai:
-        mock_client = Mock()
-        # First 5 calls are for answer queries (high confidence)
-        # Next 3 calls are for uncertainty phrases (low confidence)
-        mock_client.chat.completions.create.side_effect = [
-            create_mock_response(resp, logprob=-0.05) for resp in responses
-        ] + [
-            create_mock_response(phrase, logprob=-2.0) for phrase in uncertainty_phrases_responses
-        ]
-        mock_openai.return_value = mock_client
-        
-        measurer = UncertaintyMeasurer(api_key="demo-key")
-        results = measurer.measure_uncertainty("What is the capital of France?", num_samples=5, uncertainty_threshold=1.0)
-        
-        print("\n" + "-" * 80)
-        print("RESULTS")
-        print("-" * 80)
-        analysis = results["uncertainty_analysis"]
-        print(f"Uncertainty Level: {analysis['uncertainty_level'].upper()}")
-        print(f"Response Diversity: {analysis['response_diversity']} ({analysis['unique_responses']}/{analysis['total_samples']} unique)")
-        print(f"Average Token Confidence: {analysis['average_token_confidence']}")
-        
-        if 'certainty_ratio' in analysis:
-            print(f"\n🎯 NEW FEATURE - Certainty Ratio Analysis:")
-            print(f"  Answer Mean Logprob: {analysis['answer_mean_logprob']}")
-            print(f"  Uncertainty Phrases Mean Logprob: {analysis['uncertainty_phrase_mean_logprob']}")
-            print(f"  Certainty Ratio: {analysis['certainty_ratio']}")
-            print(f"  Threshold: {analysis['uncertainty_threshold']}")
-            print(f"  Status: {'UNCERTAIN' if analysis['is_uncertain'] else 'CONFIDENT'}")
-            print(f"\nTool Response: {results.get('tool_response', 'N/A')[:100]}...")
-        
-        print(f"\nInterpretation: {analysis['recommendation']}")
+    # The 5 answer queries are parsed completions (high confidence); the 3
+    # uncertainty-phrase probes run alongside them and read the raw response
+    # body (low confidence)
+    # Last call is for generating the uncertainty message, since the ratio
+    # ends up below the threshold
+    mock_client.chat.completions.create = AsyncMock(side_effect=[
+        create_mock_response(resp, logprob=-0.05) for resp in responses
+    ] + [
+        create_mock_response("whether you mean the current capital or a historical one. Could you clarify?", logprob=-0.3)
+    ])
+    mock_client.chat.completions.with_raw_response.create = AsyncMock(side_effect=[
+        create_mock_raw_response(phrase, logprob=-2.0) for phrase in uncertainty_phrases_responses
+    ])
+    
+    results = measurer.measure_uncertainty("What is the capital of France?", num_samples=5, uncertainty_threshold=1.0)
+    
+    print("\n" + "-" * 80)
+    print("RESULTS")
+    print("-" * 80)
+    analysis = results["uncertainty_analysis"]
+    print(f"Uncertainty Level: {analysis['uncertainty_level'].upper()}")
+    print(f"Response Diversity: {analysis['response_diversity']} ({analysis['unique_responses']}/{analysis['total_samples']} unique)")
+    print(f"Average Token Confidence: {analysis['average_token_confidence']}")
+    
+    if 'certainty_ratio' in analysis:
+        print(f"\n🎯 NEW FEATURE - Certainty Ratio Analysis:")
+        print(f"  Answer Mean Logprob: {analysis['answer_mean_logprob']}")
+        print(f"  Uncertainty Phrases Mean Logprob: {analysis['uncertainty_phrase_mean_logprob']}")
+        print(f"  Certainty Ratio: {analysis['certainty_ratio']}")
+        print(f"  Threshold: {analysis['uncertainty_threshold']}")
+        print(f"  Status: {'UNCERTAIN' if analysis['is_uncertain'] else 'CONFIDENT'}")
+        print(f"\nTool Response: {results.get('tool_response', 'N/A')[:100]}...")
+    
+    print(f"\nInterpretation: {analysis['recommendation']}")
 
 
-def demo_high_uncertainty():
+@buffered_output
+def demo_high_uncertainty(measurer, mock_client):
     """Demonstrate high uncertainty (controversial/ambiguous question)."""
     print("\n\n" + "=" * 80)
     print("DEMO 2: UNCERTAIN RESPONSE - Low Certainty Ratio")
@@ -107,51 +130,40 @@ def demo_high_uncertainty():
         "Existence could be an emergent property of the universe."
     ]
     
-    # Mock uncertainty phrases
-    uncertainty_phrases_responses = [
-        "I'm not sure about that",
-        "I'm insecure about this", 
-        "I need help with this"
-    ]
+    # First 5 calls are for answer queries (low confidence - similar to uncertainty phrases)
+    # The uncertainty phrase logprobs are cached from the first demo, so no
+    # phrase probes are sent
+    # Last call is for generating the uncertainty message
+    mock_client.chat.completions.create = AsyncMock(side_effect=[
+        create_mock_response(resp, logprob=-1.8) for resp in responses
+    ] + [
+        create_mock_response("the specific aspect of existence you're asking about - whether it's philosophical, scientific, or personal meaning. Could you clarify?", logprob=-0.3)
+    ])
     
-    with patch('src.measure_uncertainty.OpenAI') as mock_openai:
-        mock_client = Mock()
-        # First 5 calls are for answer queries (low confidence - similar to uncertainty phrases)
-        # Next 3 calls are for uncertainty phrases
-        # Last call is for generating the uncertainty message
-        mock_client.chat.completions.create.side_effect = [
-            create_mock_response(resp, logprob=-1.8) for resp in responses
-        ] + [
-            create_mock_response(phrase, logprob=-2.0) for phrase in uncertainty_phrases_responses
-        ] + [
-            create_mock_response("the specific aspect of existence you're asking about - whether it's philosophical, scientific, or personal meaning. Could you clarify?", logprob=-0.3)
-        ]
-        mock_openai.return_value = mock_client
-        
-        measurer = UncertaintyMeasurer(api_key="demo-key")
-        results = measurer.measure_uncertainty("What is the meaning of existence?", num_samples=5, uncertainty_threshold=1.0)
-        
-        print("\n" + "-" * 80)
-        print("RESULTS")
-        print("-" * 80)
-        analysis = results["uncertainty_analysis"]
-        print(f"Uncertainty Level: {analysis['uncertainty_level'].upper()}")
-        print(f"Response Diversity: {analysis['response_diversity']} ({analysis['unique_responses']}/{analysis['total_samples']} unique)")
-        print(f"Average Token Confidence: {analysis['average_token_confidence']}")
-        
-        if 'certainty_ratio' in analysis:
-            print(f"\n🎯 NEW FEATURE - Certainty Ratio Analysis:")
-            print(f"  Answer Mean Logprob: {analysis['answer_mean_logprob']}")
-            print(f"  Uncertainty Phrases Mean Logprob: {analysis['uncertainty_phrase_mean_logprob']}")
-            print(f"  Certainty Ratio: {analysis['certainty_ratio']}")
-            print(f"  Threshold: {analysis['uncertainty_threshold']}")
-            print(f"  Status: {'UNCERTAIN' if analysis['is_uncertain'] else 'CONFIDENT'}")
-            print(f"\nTool Response: {results.get('tool_response', 'N/A')[:150]}...")
-        
-        print(f"\nInterpretation: {analysis['recommendation']}")
+    results = measurer.measure_uncertainty("What is the meaning of existence?", num_samples=5, uncertainty_threshold=1.0)
+    
+    print("\n" + "-" * 80)
+    print("RESULTS")
+    print("-" * 80)
+    analysis = results["uncertainty_analysis"]
+    print(f"Uncertainty Level: {analysis['uncertainty_level'].upper()}")
+    print(f"Response Diversity: {analysis['response_diversity']} ({analysis['unique_responses']}/{analysis['total_samples']} unique)")
+    print(f"Average Token Confidence: {analysis['average_token_confidence']}")
+    
+    if 'certainty_ratio' in analysis:
+        print(f"\n🎯 NEW FEATURE - Certainty Ratio Analysis:")
+        print(f"  Answer Mean Logprob: {analysis['answer_mean_logprob']}")
+        print(f"  Uncertainty Phrases Mean Logprob: {analysis['uncertainty_phrase_mean_logprob']}")
+        print(f"  Certainty Ratio: {analysis['certainty_ratio']}")
+        print(f"  Threshold: {analysis['uncertainty_threshold']}")
+        print(f"  Status: {'UNCERTAIN' if analysis['is_uncertain'] else 'CONFIDENT'}")
+        print(f"\nTool Response: {results.get('tool_response', 'N/A')[:150]}...")
+    
+    print(f"\nInterpretation: {analysis['recommendation']}")
 
 
-def demo_medium_uncertainty():
+@buffered_output
+def demo_medium_uncertainty(measurer, mock_client):
     """Demonstrate medium uncertainty (complex question with variations)."""
     print("\n\n" + "=" * 80)
     print("DEMO 3: MEDIUM UNCERTAINTY - Complex Question")
@@ -168,51 +180,53 @@ def demo_medium_uncertainty():
         "The integration of sensory data and memory creates conscious awareness."
     ]
     
-    with patch('src.measure_uncertainty.OpenAI') as mock_openai:
-        mock_client = Mock()
-        mock_client.chat.completions.create.side_effect = [
-            create_mock_response(resp, logprob=-0.4) for resp in responses
-        ]
-        mock_openai.return_value = mock_client
-        
-        measurer = UncertaintyMeasurer(api_key="demo-key")
-        results = measurer.measure_uncertainty("How does consciousness emerge?", num_samples=5)
-        
-        print("\n" + "-" * 80)
-        print("RESULTS")
-        print("-" * 80)
-        analysis = results["uncertainty_analysis"]
-        print(f"Uncertainty Level: {analysis['uncertainty_level'].upper()}")
-        print(f"Response Diversity: {analysis['response_diversity']} ({analysis['unique_responses']}/{analysis['total_samples']} unique)")
-        print(f"Average Token Confidence: {analysis['average_token_confidence']}")
-        print(f"\nInterpretation: {analysis['recommendation']}")
+    # First 5 calls are for answer queries
+    # The uncertainty phrase logprobs are cached from the first demo, so no
+    # phrase probes are sent
+    # Last call is for generating the uncertainty message
+    mock_client.chat.completions.create = AsyncMock(side_effect=[
+        create_mock_response(resp, logprob=-0.4) for resp in responses
+    ] + [
+        create_mock_response("which level of explanation you are after - the neural mechanisms or the philosophical question of experience.", logprob=-0.3)
+    ])
+    
+    results = measurer.measure_uncertainty("How does consciousness emerge?", num_samples=5)
+    
+    print("\n" + "-" * 80)
+    print("RESULTS")
+    print("-" * 80)
+    analysis = results["uncertainty_analysis"]
+    print(f"Uncertainty Level: {analysis['uncertainty_level'].upper()}")
+    print(f"Response Diversity: {analysis['response_diversity']} ({analysis['unique_responses']}/{analysis['total_samples']} unique)")
+    print(f"Average Token Confidence: {analysis['average_token_confidence']}")
+    print(f"\nInterpretation: {analysis['recommendation']}")
 
 
+@buffered_output
 def demo_function_calling():
     """Demonstrate the function calling schema."""
     print("\n\n" + "=" * 80)
     print("DEMO 4: FUNCTION CALLING SCHEMA")
     print("=" * 80)
     
-    with patch('src.llm_interface.OpenAI'):
-        from src.llm_interface import LLMFunctionInterface
-        
-        interface = LLMFunctionInterface(api_key="demo-key")
-        schema = interface.MEASURE_UNCERTAINTY_FUNCTION
-        
-        print("\nFunction Schema that LLM receives:")
-        print("-" * 80)
-        print(f"Function Name: {schema['function']['name']}")
-        print(f"Description: {schema['function']['description'][:100]}...")
-        print("\nParameters:")
-        for param, details in schema['function']['parameters']['properties'].items():
-            required = "✓" if param in schema['function']['parameters']['required'] else "○"
-            print(f"  [{required}] {param}: {details['description'][:70]}...")
-            if param == 'uncertainty_threshold':
-                print(f"       🎯 NEW: Controls certainty ratio threshold!")
-        
-        print("\nThe LLM is forced to use this function via:")
-        print("  tool_choice={'type': 'function', 'function': {'name': 'measure_uncertainty'}}")
+    from src.llm_interface import LLMFunctionInterface
+    
+    interface = LLMFunctionInterface(api_key="demo-key", warmup=False)
+    schema = interface.MEASURE_UNCERTAINTY_FUNCTION
+    
+    print("\nFunction Schema that LLM receives:")
+    print("-" * 80)
+    print(f"Function Name: {schema['function']['name']}")
+    print(f"Description: {schema['function']['description'][:100]}...")
+    print("\nParameters:")
+    for param, details in schema['function']['parameters']['properties'].items():
+        required = "✓" if param in schema['function']['parameters']['required'] else "○"
+        print(f"  [{required}] {param}: {details['description'][:70]}...")
+        if param == 'uncertainty_threshold':
+            print(f"       🎯 NEW: Controls certainty ratio threshold!")
+    
+    print("\nThe LLM is forced to use this function via:")
+    print("  tool_choice={'type': 'function', 'function': {'name': 'measure_uncertainty'}}")
 
 
 def main():
@@ -225,10 +239,18 @@ def main():
     print("\nNote: These are simulated responses for demonstration purposes.")
     
     try:
-        demo_low_uncertainty()
-        demo_high_uncertainty()
-        demo_medium_uncertainty()
-        demo_function_calling()
+        # Patch the API clients once for all demos; one measurer is shared, as
+        # a real session would reuse its client
+        with patch('src.measure_uncertainty.get_async_client') as mock_openai, \
+                patch('src.llm_interface.get_async_client'):
+            mock_client = Mock()
+            mock_openai.return_value = mock_client
+            measurer = UncertaintyMeasurer(api_key="demo-key")
+            
+            demo_low_uncertainty(measurer, mock_client)
+            demo_high_uncertainty(measurer, mock_client)
+            demo_medium_uncertainty(measurer, mock_client)
+            demo_function_calling()
         
         print("\n\n" + "=" * 80)
         print("DEMONSTRATION COMPLETE")
@@ -5,9 +5,7 @@ This example shows how to use the system programmatically.
 """
 
 import os
-from dotenv import load_dotenv
-from src.llm_interface import LLMFunctionInterface
-from src.measure_uncertainty import UncertaintyMeasurer
+import asyncio
 
 
 def example_1_basic_usage():
@@ -16,6 +14,8 @@ def example_1_basic_usage():
     print("EXAMPLE 1: Basic Usage")
     print("=" * 80)
     
+    from src.llm_interface import LLMFunctionInterface
+    
     # Initialize the interface
     interface = LLMFunctionInterface(model="gpt-4")
     
@@ -45,6 +45,8 @@ def example_2_direct_uncertainty_measurement():
     print("EXAMPLE 2: Direct Uncertainty Measurement")
     print("=" * 80)
     
+    from src.measure_uncertainty import UncertaintyMeasurer
+    
     # Initialize the uncertainty measurer
     measurer = UncertaintyMeasurer(model="gpt-4")
     
@@ -62,12 +64,13 @@ def example_2_direct_uncertainty_measurement():
     print("\n" + measurer.format_results(results))
 
 
-def example_3_comparing_uncertainties():
+async def example_3_comparing_uncertainties():
     """Example 3: Compare uncertainty across different types of questions."""
     print("\n\n" + "=" * 80)
     print("EXAMPLE 3: Comparing Uncertainties")
     print("=" * 80)
     
+    from src.measure_uncertainty import UncertaintyMeasurer
     measurer = UncertaintyMeasurer(model="gpt-4")
     
     questions = [
@@ -76,16 +79,54 @@ def example_3_comparing_uncertainties():
         ("Complex", "How does consciousness emerge from neural activity?")
     ]
     
-    for category, question in questions:
+    # Measure all questions concurrently instead of one after another
+    results_list = await asyncio.gather(*[
+        measurer.ameasure_uncertainty(
+            question,
+            num_samples=3,  # Fewer samples for this comparison
+            temperature=0.7
+        )
+        for _, question in questions
+    ])
+    
+    for (category, question), results in zip(questions, results_list):
         print(f"\n{'-' * 80}")
         print(f"{category} Question: {question}")
         print('-' * 80)
         
-        results = measurer.measure_uncertainty(
-            prompt=question,
-            num_samples=3,  # Fewer samples for this comparison
-            temperature=0.7
-        )
+        analysis = results["uncertainty_analysis"]
+        print(f"\nUncertainty Level: {analysis['uncertainty_level']}")
+        print(f"Response Diversity: {analysis['response_diversity']}")
+        print(f"Unique Responses: {analysis['unique_responses']}/{analysis['total_samples']}")
+
+
+def example_4_batch_comparison():
+    """Example 4: Compare uncertainties through the Batch API."""
+    print("\n\n" + "=" * 80)
+    print("EXAMPLE 4: Batch Comparison")
+    print("=" * 80)
+    
+    from src.measure_uncertainty import UncertaintyMeasurer
+    measurer = UncertaintyMeasurer(model="gpt-4")
+    
+    questions = [
+        ("Factual", "What is 2 + 2?"),
+        ("Ambiguous", "What is the best programming language?"),
+        ("Complex", "How does consciousness emerge from neural activity?")
+    ]
+    
+    # Nobody is waiting on an individual answer here, so submit all samples
+    # as one Batch API job (about half the cost; may take a while to finish)
+    results_list = measurer.measure_uncertainty_batch(
+        [question for _, question in questions],
+        num_samples=3,
+        temperature=0.7
+    )
+    
+    for (category, question), results in zip(questions, results_list):
+        print(f"\n{'-' * 80}")
+        print(f"{category} Question: {question}")
+        print('-' * 80)
         
         analysis = results["uncertainty_analysis"]
         print(f"\nUncertainty Level: {analysis['uncertainty_level']}")
@@ -96,6 +137,7 @@ def example_3_comparing_uncertainties():
 def main():
     """Run all examples."""
     # Load environment variables
+    from dotenv import load_dotenv
     load_dotenv()
     
     # Check if API key is set
@@ -116,7 +158,8 @@ def main():
         
         # Uncomment to run additional examples (they make more API calls)
         # example_2_direct_uncertainty_measurement()
-        # example_3_comparing_uncertainties()
+        # asyncio.run(example_3_comparing_uncertainties())
+        # example_4_batch_comparison()
         
         print("\n\n" + "=" * 80)
         print("EXAMPLES COMPLETED")
@@ -8,13 +8,22 @@ measure_uncertainty tool.
 
 import os
 import sys
-from dotenv import load_dotenv
-from src.llm_interface import LLMFunctionInterface
+import asyncio
+from typing import Optional
 
+# Horizontal rules for the console output
+_HR = "=" * 80
 
-def main():
-    """Main application entry point."""
+
+async def amain():
+    """
+    Main application entry point.
+    
+    The prompt is read asynchronously, so while the user types the next
+    question the previous one is still being processed in the background.
+    """
     # Load environment variables
+    from dotenv import load_dotenv
     load_dotenv()
     
     # Check if API key is set
@@ -24,70 +33,112 @@ def main():
         print("Example: OPENAI_API_KEY=sk-...")
         sys.exit(1)
     
-    print("=" * 80)
+    print(_HR)
     print("UNCERTAINTY-AWARE LLM INTERFACE")
-    print("=" * 80)
+    print(_HR)
     print("\nThis interface uses function calling to measure uncertainty in LLM responses.")
     print("The LLM will automatically use the 'measure_uncertainty' tool for every query.")
     print("\nCommands:")
     print("  - Type your question to get an uncertainty-aware response")
     print("  - Type 'reset' to clear conversation history")
     print("  - Type 'quit' or 'exit' to exit")
-    print("=" * 80)
+    print(_HR)
     
-    # Initialize the interface
+    # Initialize the interface; the OpenAI and prompt_toolkit stacks are only
+    # imported once the banner is on screen
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.patch_stdout import patch_stdout
+    from src.llm_interface import LLMFunctionInterface
     model = os.environ.get("OPENAI_MODEL", "gpt-4")
+    max_concurrency = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "8"))
     print(f"\n🚀 Initializing LLM interface with model: {model}\n")
     
-    interface = LLMFunctionInterface(model=model)
+    interface = LLMFunctionInterface(model=model, max_concurrency=max_concurrency)
+    verbose = "--verbose" in sys.argv or "-v" in sys.argv
+    session = PromptSession()
+    pending_task: Optional[asyncio.Task] = None
+    
+    def show_result(task: asyncio.Task):
+        """Display a finished turn (or its error) once the task completes."""
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            import traceback
+            print(f"\n❌ Error: {str(error)}\n")
+            traceback.print_exception(type(error), error, error.__traceback__)
+            return
+        
+        # Optionally display the detailed uncertainty analysis
+        if verbose:
+            print("\n".join([
+                "\n" + _HR,
+                "DETAILED UNCERTAINTY ANALYSIS",
+                _HR,
+                task.result()["formatted_results"]
+            ]))
+    
+    async def wait_pending():
+        """Let the previous turn finish; its errors were already reported."""
+        if pending_task is not None and not pending_task.done():
+            try:
+                await pending_task
+            except Exception:
+                pass
     
-    # Interactive loop
-    while True:
-        try:
-            user_input = input("\n👤 You: ").strip()
+    # Interactive loop; output from a running turn is printed above the prompt
+    with patch_stdout():
+        while True:
+            try:
+                user_input = (await session.prompt_async("\n👤 You: ")).strip()
+            except (KeyboardInterrupt, EOFError):
+                if pending_task is not None:
+                    pending_task.cancel()
+                print("\n\n👋 Goodbye!\n")
+                break
             
             if not user_input:
                 continue
             
             if user_input.lower() in ['quit', 'exit']:
+                await wait_pending()
                 print("\n👋 Goodbye!\n")
                 break
             
+            # Turns share the conversation history, so they must not overlap
+            await wait_pending()
+            
             if user_input.lower() == 'reset':
                 interface.reset_conversation()
                 continue
             
-            # Process the user message
-            result = interface.process_user_message(user_input)
-            
-            # Optionally display the detailed uncertainty analysis
-            if "--verbose" in sys.argv or "-v" in sys.argv:
-                print("\n" + "=" * 80)
-                print("DETAILED UNCERTAINTY ANALYSIS")
-                print("=" * 80)
-                print(result["formatted_results"])
-            
-        except KeyboardInterrupt:
-            print("\n\n👋 Goodbye!\n")
-            break
-        except Exception as e:
-            print(f"\n❌ Error: {str(e)}\n")
-            import traceback
-            traceback.print_exc()
+            # Process the user message while the next prompt is shown
+            pending_task = asyncio.create_task(interface.aprocess_user_message(user_input))
+            pending_task.add_done_callback(show_result)
+    
+    # Close the pooled connections while their event loop is still running
+    await interface.aclose()
+
+
+def main():
+    """Run the interactive application."""
+    asyncio.run(amain())
 
 
 def run_example():
     """Run a simple example without interactive mode."""
+    from dotenv import load_dotenv
     load_dotenv()
     
     if not os.environ.get("OPENAI_API_KEY"):
         print("❌ Error: OPENAI_API_KEY environment variable not set")
         sys.exit(1)
     
-    print("=" * 80)
+    print(_HR)
     print("EXAMPLE: Uncertainty-Aware LLM Interface")
-    print("=" * 80)
+    print(_HR)
     
+    from src.llm_interface import LLMFunctionInterface
     interface = LLMFunctionInterface()
     
     # Example question
@@ -97,9 +148,9 @@ def run_example():
     
     result = interface.process_user_message(example_question)
     
-    print("\n" + "=" * 80)
+    print("\n" + _HR)
     print("FULL RESULTS")
-    print("=" * 80)
+    print(_HR)
     print(result["formatted_results"])
 
 
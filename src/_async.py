@@ -0,0 +1,58 @@
+"""
+Event-loop helpers
+
+The synchronous entry points of this package are thin wrappers around async
+implementations. Instead of spinning up a fresh loop with ``asyncio.run`` for
+every call (which would orphan the keep-alive connections held by
+``AsyncOpenAI``), all of them run on a single long-lived loop owned by a
+daemon thread.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Coroutine, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background event loop, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_loop.run_forever,
+                name="uncertainty-aware-loop",
+                daemon=True
+            )
+            thread.start()
+        return _loop
+
+
+def run_sync(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Run a coroutine to completion from synchronous code.
+
+    Args:
+        coro: The coroutine to execute
+
+    Returns:
+        The coroutine's result
+    """
+    return run_in_background(coro).result()
+
+
+def run_in_background(coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+    """
+    Schedule a coroutine on the shared loop without waiting for it.
+
+    Args:
+        coro: The coroutine to execute
+
+    Returns:
+        A future for the coroutine's result
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
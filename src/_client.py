@@ -0,0 +1,117 @@
+"""
+Shared OpenAI clients
+
+The interface and the measurer talk to the same API. Handing them one
+``AsyncOpenAI`` client lets the router call, the samples and the phrase
+probes reuse the same pool of keep-alive connections instead of each object
+opening (and TLS-handshaking) its own.
+
+The clients fail fast: each request has a bounded timeout and the SDK's own
+retries are disabled, so a hung connection is abandoned after seconds and
+retried by ``retrying`` with jittered backoff instead of stalling a sample.
+"""
+
+import asyncio
+import importlib.util
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    InternalServerError,
+    RateLimitError,
+    Timeout
+)
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential
+)
+from src._async import _get_loop
+
+# A stalled connect fails within seconds; a slow generation gets 30s
+REQUEST_TIMEOUT = Timeout(30.0, connect=5.0)
+
+# With the optional h2 package, concurrent samples are multiplexed as HTTP/2
+# streams over one TLS connection instead of opening one connection each
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Transient failures worth another attempt: rate limits, timeouts and dropped
+# connections (APITimeoutError is an APIConnectionError), and 5xx responses
+_RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# event loop -> (api_key, base_url) -> client
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Optional[str], Optional[str]], AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def get_async_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Return the shared ``AsyncOpenAI`` client for the given credentials.
+
+    Pooled connections belong to the event loop that opened them, so one
+    client is kept per loop: the caller's running loop, or else the
+    background loop the synchronous wrappers run on.
+
+    Args:
+        api_key: OpenAI API key
+        base_url: API base URL (None for the SDK default)
+
+    Returns:
+        The memoized client
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = _get_loop()
+
+    with _clients_lock:
+        loop_clients = _clients.setdefault(loop, {})
+        client = loop_clients.get((api_key, base_url))
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=REQUEST_TIMEOUT,
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(http2=_HTTP2)
+            )
+            loop_clients[(api_key, base_url)] = client
+        return client
+
+
+async def aclose_client(client: AsyncOpenAI):
+    """
+    Close a shared client and forget it, so later callers get a new one.
+
+    Args:
+        client: A client returned by ``get_async_client``
+    """
+    with _clients_lock:
+        for loop_clients in _clients.values():
+            for key, shared in list(loop_clients.items()):
+                if shared is client:
+                    del loop_clients[key]
+    await client.close()
+
+
+def retrying(max_retries: int) -> AsyncRetrying:
+    """
+    Return the retry policy for requests made with the shared clients.
+
+    Args:
+        max_retries: Retries per request after the first attempt (0 disables
+            retrying)
+
+    Returns:
+        A tenacity ``AsyncRetrying`` to call the request through
+    """
+    return AsyncRetrying(
+        wait=wait_random_exponential(multiplier=0.5, max=4),
+        stop=stop_after_attempt(max_retries + 1),
+        retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+        reraise=True
+    )
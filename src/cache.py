@@ -0,0 +1,72 @@
+"""
+Cache Backends
+
+The measurer keeps reusable samples in a ``CacheBackend``. The default is an
+in-process LRU; anything with the same ``get``/``set`` methods, such as a
+``diskcache.Cache`` or a thin Redis wrapper, can be passed instead to keep
+the entries across runs.
+"""
+
+from collections import OrderedDict
+from typing import Any, Optional, Protocol
+
+
+class CacheBackend(Protocol):
+    """Key-value store for cached measurements."""
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value stored under ``key``, or None."""
+        ...
+
+    def set(self, key: str, value: Any) -> None:
+        """Store ``value`` under ``key``."""
+        ...
+
+
+class LRUCache:
+    """
+    An in-memory cache that evicts the least recently used entry when full.
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize the LRUCache.
+
+        Args:
+            max_entries: Number of entries to keep (0 stores nothing)
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up an entry and mark it as recently used.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The stored value, or None on a miss
+        """
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store an entry, evicting the least recently used one if needed.
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
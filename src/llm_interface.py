@@ -6,56 +6,179 @@ uses the measure_uncertainty function/tool when responding to user queries.
 """
 
 import os
+import re
 import json
-from typing import Optional, Dict, Any
-from openai import OpenAI
+import asyncio
+import hashlib
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Tuple
+import orjson
+from openai import AsyncOpenAI
+from src._async import run_in_background, run_sync
+from src._client import aclose_client, get_async_client, retrying
 from src.measure_uncertainty import UncertaintyMeasurer
+from src.semantic_cache import SemanticUncertaintyCache
 
+# The system prompt is a constant so every request starts with a
+# byte-identical prefix, which lets OpenAI's automatic prompt caching reuse it
+SYSTEM_MESSAGE = MappingProxyType({
+    "role": "system",
+    "content": (
+        "You are an uncertainty-aware AI assistant. For every user query, "
+        "you MUST use the 'measure_uncertainty' function to analyze the query "
+        "and measure uncertainty in the response. After receiving the uncertainty "
+        "results, provide a comprehensive answer to the user that incorporates "
+        "the uncertainty analysis."
+    )
+})
 
-class LLMFunctionInterface:
+# Matches a complete "prompt" string value in partially streamed JSON arguments
+_PROMPT_ARGUMENT_RE = re.compile(r'"prompt"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+
+def _completed_prompt_argument(arguments: str) -> Optional[str]:
     """
-    An interface for a function-calling LLM that uses the measure_uncertainty tool.
+    Extract the ``prompt`` argument once its string value has been streamed.
+    
+    Args:
+        arguments: Tool-call arguments JSON received so far
+        
+    Returns:
+        The decoded prompt, or None while it is still incomplete
+    """
+    match = _PROMPT_ARGUMENT_RE.search(arguments)
+    if match is None:
+        return None
+    return orjson.loads(match.group(1))
+
+
+# Defaults of the optional measure_uncertainty arguments, in the parameter
+# order of _measure_uncertainty. The schema, the argument parsing and the
+# measurement started while streaming all use them, so a speculative result
+# always matches a call that leaves the arguments out.
+_TOOL_ARGUMENT_DEFAULTS = MappingProxyType({
+    "num_samples": 5,
+    "temperature": 0.7,
+    "uncertainty_threshold": 1.0
+})
+
+
+def _measurement_params(prompt: str, function_args: Dict[str, Any]) -> Tuple[Any, ...]:
     """
+    Build the ``_measure_uncertainty`` arguments for a tool call.
     
-    # Define the function schema for the measure_uncertainty tool
-    MEASURE_UNCERTAINTY_FUNCTION = {
-        "type": "function",
-        "function": {
-            "name": "measure_uncertainty",
-            "description": "Measures uncertainty in LLM responses by querying the model multiple times and analyzing token logits to assess confidence and variability in answers.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {
-                        "type": "string",
-                        "description": "The user's question or prompt to analyze for uncertainty"
-                    },
-                    "num_samples": {
-                        "type": "integer",
-                        "description": "Number of times to query the LLM (default: 5)",
-                        "default": 5
-                    },
-                    "temperature": {
-                        "type": "number",
-                        "description": "Temperature for sampling - higher values produce more diverse responses (default: 0.7)",
-                        "default": 0.7
-                    },
-                    "uncertainty_threshold": {
-                        "type": "number",
-                        "description": "Threshold for certainty ratio. If ratio < threshold, LLM is uncertain (default: 1.0)",
-                        "default": 1.0
-                    }
+    Args:
+        prompt: The prompt to measure
+        function_args: Parsed tool-call arguments; missing ones take their defaults
+        
+    Returns:
+        Tuple of (prompt, num_samples, temperature, uncertainty_threshold)
+    """
+    return (prompt, *(
+        function_args.get(name, default) for name, default in _TOOL_ARGUMENT_DEFAULTS.items()
+    ))
+
+
+# Define the function schema for the measure_uncertainty tool once at import
+# time; it is identical for every instance and every turn
+MEASURE_UNCERTAINTY_FUNCTION = MappingProxyType({
+    "type": "function",
+    "function": {
+        "name": "measure_uncertainty",
+        "description": "Measures uncertainty in LLM responses by querying the model multiple times and analyzing token logits to assess confidence and variability in answers.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "prompt": {
+                    "type": "string",
+                    "description": "The user's question or prompt to analyze for uncertainty"
+                },
+                "num_samples": {
+                    "type": "integer",
+                    "description": f"Number of times to query the LLM (default: {_TOOL_ARGUMENT_DEFAULTS['num_samples']})",
+                    "default": _TOOL_ARGUMENT_DEFAULTS["num_samples"]
                 },
-                "required": ["prompt"]
-            }
+                "temperature": {
+                    "type": "number",
+                    "description": f"Temperature for sampling - higher values produce more diverse responses (default: {_TOOL_ARGUMENT_DEFAULTS['temperature']})",
+                    "default": _TOOL_ARGUMENT_DEFAULTS["temperature"]
+                },
+                "uncertainty_threshold": {
+                    "type": "number",
+                    "description": f"Threshold for certainty ratio. If ratio < threshold, LLM is uncertain (default: {_TOOL_ARGUMENT_DEFAULTS['uncertainty_threshold']})",
+                    "default": _TOOL_ARGUMENT_DEFAULTS["uncertainty_threshold"]
+                }
+            },
+            "required": ["prompt"]
         }
     }
+})
+
+# Request arguments for the forced tool call, built once and shared by all turns
+_TOOLS = (MEASURE_UNCERTAINTY_FUNCTION,)
+_TOOL_CHOICE = MappingProxyType({
+    "type": "function",
+    "function": MappingProxyType({"name": "measure_uncertainty"})
+})
+
+
+# Fixed opening of every tool result, so that it extends the cached prompt
+# prefix; the values that change from call to call follow it
+_TOOL_RESULT_PREAMBLE = "Uncertainty tool completed. See metrics below:\n"
+
+# Analysis entries passed back to the LLM, least variable first
+_TOOL_RESULT_METRICS = (
+    "uncertainty_level",
+    "response_diversity",
+    "average_token_confidence",
+    "certainty_ratio",
+    "uncertainty_threshold",
+    "error"
+)
+
+
+def _tool_result_content(uncertainty_results: Dict[str, Any]) -> str:
+    """
+    Build the tool message content for a measurement.
+    
+    Args:
+        uncertainty_results: Results from the measurer
+        
+    Returns:
+        The fixed preamble followed by a compact JSON summary
+    """
+    analysis = uncertainty_results["uncertainty_analysis"]
+    summary = {
+        "is_uncertain": uncertainty_results.get("is_uncertain", False),
+        "tool_response": uncertainty_results.get("tool_response", "")
+    }
+    for key in _TOOL_RESULT_METRICS:
+        if key in analysis:
+            value = analysis[key]
+            summary[key] = round(value, 2) if isinstance(value, float) else value
+    return _TOOL_RESULT_PREAMBLE + orjson.dumps(summary, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+class LLMFunctionInterface:
+    """
+    An interface for a function-calling LLM that uses the measure_uncertainty tool.
+    """
+    
+    # Function schema for the measure_uncertainty tool (shared, read-only)
+    MEASURE_UNCERTAINTY_FUNCTION = MEASURE_UNCERTAINTY_FUNCTION
     
     def __init__(
         self,
         api_key: Optional[str] = None,
         model: str = "gpt-4",
-        uncertainty_model: Optional[str] = None
+        uncertainty_model: Optional[str] = None,
+        max_concurrency: int = 8,
+        warmup: bool = True,
+        cache_size: int = 128,
+        semantic_cache_threshold: Optional[float] = None,
+        skip_second_call: bool = True,
+        router_model: Optional[str] = None
     ):
         """
         Initialize the LLM function-calling interface.
@@ -64,21 +187,158 @@ class LLMFunctionInterface:
             api_key: OpenAI API key
             model: Model for the main interface LLM
             uncertainty_model: Model for uncertainty measurement (defaults to same as model)
+            max_concurrency: Maximum concurrent API requests while measuring uncertainty
+            warmup: Open a connection to the API and fetch the uncertainty-phrase
+                baseline in the background, so the first user turn pays for
+                neither the TLS handshake nor the phrase queries
+            cache_size: Number of answered turns to remember; a repeated question
+                in the same conversation state is answered without API calls
+                (0 disables the cache)
+            semantic_cache_threshold: If set, embed each measured prompt and reuse
+                the uncertainty results of an earlier prompt whose embedding has
+                at least this cosine similarity (e.g. 0.92)
+            skip_second_call: When the measurement is confident, reply with the
+                tool's answer directly instead of asking the LLM to phrase a
+                final response (saves one API call per turn)
+            router_model: Model for the forced tool call, which only emits a few
+                tokens of arguments; defaults to OPENAI_ROUTER_MODEL or
+                gpt-4o-mini. Must support forced function calling.
         """
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         self.model = model
         self.uncertainty_model = uncertainty_model or model
-        self.client = OpenAI(api_key=self.api_key)
+        self.router_model = router_model or os.environ.get("OPENAI_ROUTER_MODEL", "gpt-4o-mini")
         self.uncertainty_measurer = UncertaintyMeasurer(
             api_key=self.api_key,
-            model=self.uncertainty_model
+            model=self.uncertainty_model,
+            max_concurrency=max_concurrency
         )
-        self.conversation_history = []
+        self.semantic_cache = (
+            SemanticUncertaintyCache(self.client, threshold=semantic_cache_threshold)
+            if semantic_cache_threshold is not None else None
+        )
+        # Messages sent to the LLM: the system message followed by the
+        # conversation. Turns are appended in place, so earlier messages (and
+        # their cached prompt prefix) never change.
+        self._messages: List[Any] = [SYSTEM_MESSAGE]
+        # Prompt tokens served from OpenAI's prompt cache in this conversation
+        self.cached_tokens = 0
+        self.skip_second_call = skip_second_call
+        self.cache_size = cache_size
+        # LRU of turn key -> (result, messages the turn appended to the history)
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], List[Dict[str, Any]]]]" = OrderedDict()
+        if warmup:
+            self._schedule_warmup()
+    
+    def _schedule_warmup(self):
+        """
+        Start ``awarmup`` without blocking.
+        
+        It runs on the caller's event loop when constructed from async code,
+        otherwise on the shared loop used by the synchronous methods, so the
+        warmed connections belong to the loop that will use them.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            run_in_background(self.awarmup())
+        else:
+            self._warmup_task = loop.create_task(self.awarmup())
+    
+    async def awarmup(self):
+        """
+        Populate the client's connection pool with a cheap request, and fetch
+        the uncertainty-phrase baseline so the first measurement finds it cached.
+        """
+        await asyncio.gather(
+            self._open_connection(),
+            self.uncertainty_measurer.aprefetch_baseline()
+        )
+    
+    async def _open_connection(self):
+        """Send a cheap request so the connection pool holds an open connection."""
+        try:
+            await self.client.models.retrieve(self.model)
+        except Exception:
+            # Best effort only; the first real request will connect anyway
+            pass
+    
+    @property
+    def client(self) -> AsyncOpenAI:
+        """
+        The shared API client for the running event loop.
+        
+        Looked up on every use rather than stored, since pooled connections
+        belong to one loop: an interface built from synchronous code and then
+        awaited under ``asyncio.run`` must not reuse the background loop's pool.
+        """
+        return get_async_client(api_key=self.api_key)
+    
+    async def aclose(self):
+        """Close the API client shared with the measurer and its pooled connections."""
+        await aclose_client(self.client)
+        if self.uncertainty_measurer.client is not self.client:
+            await self.uncertainty_measurer.aclose()
+    
+    async def __aenter__(self) -> "LLMFunctionInterface":
+        return self
+    
+    async def __aexit__(self, *exc_info: Any):
+        await self.aclose()
+    
+    @property
+    def conversation_history(self) -> List[Dict[str, Any]]:
+        """The conversation so far, without the system message."""
+        return self._messages[1:]
+    
+    @conversation_history.setter
+    def conversation_history(self, history: List[Dict[str, Any]]):
+        self._messages = [SYSTEM_MESSAGE] + list(history)
+    
+    def _record_usage(self, response: Any):
+        """
+        Add a response's prompt-cache hits to ``cached_tokens``.
+        
+        Args:
+            response: Chat completion returned by the API
+        """
+        details = getattr(getattr(response, "usage", None), "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None)
+        if isinstance(cached, int):
+            self.cached_tokens += cached
+    
+    def _cache_key(self, user_message: str) -> str:
+        """
+        Build the cache key for a user message in the current conversation state.
         
+        Args:
+            user_message: The user's input message
+            
+        Returns:
+            Hex digest of the normalized message and the conversation history
+        """
+        normalized = re.sub(r"\s+", " ", user_message.strip().lower())
+        history = orjson.dumps(self.conversation_history, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(normalized.encode() + history).hexdigest()
+    
     def process_user_message(self, user_message: str) -> Dict[str, Any]:
         """
         Process a user message through the function-calling LLM.
         
+        Synchronous wrapper around ``aprocess_user_message``.
+        
+        Args:
+            user_message: The user's input message
+            
+        Returns:
+            Dictionary containing the conversation and uncertainty results
+        """
+        return run_sync(self.aprocess_user_message(user_message))
+    
+    async def aprocess_user_message(self, user_message: str) -> Dict[str, Any]:
+        """
+        Process a user message through the function-calling LLM.
+        
         The LLM is instructed to always use the measure_uncertainty function
         to analyze the user's query.
         
@@ -90,123 +350,240 @@ class LLMFunctionInterface:
         """
         print(f"\n💬 User: {user_message}\n")
         
+        # Answer repeated questions from the cache without any API call
+        cache_key = self._cache_key(user_message) if self.cache_size > 0 else None
+        if cache_key is not None and cache_key in self._cache:
+            self._cache.move_to_end(cache_key)
+            result, turn_messages = self._cache[cache_key]
+            self._messages.extend(turn_messages)
+            print("♻️  Using cached result for this question")
+            print(f"\n🤖 Assistant: {result['assistant_response']}\n")
+            return result
+        history_start = len(self._messages)
+        
         # Add user message to conversation history
-        self.conversation_history.append({
+        self._messages.append({
             "role": "user",
             "content": user_message
         })
         
-        # Create a system message that instructs the LLM to use the function
-        system_message = {
-            "role": "system",
-            "content": (
-                "You are an uncertainty-aware AI assistant. For every user query, "
-                "you MUST use the 'measure_uncertainty' function to analyze the query "
-                "and measure uncertainty in the response. After receiving the uncertainty "
-                "results, provide a comprehensive answer to the user that incorporates "
-                "the uncertainty analysis."
-            )
-        }
+        # Call the LLM with function calling; the measurement may already be
+        # running by the time the call returns
+        content, tool_calls, speculative = await self._stream_tool_call()
         
-        # Prepare messages for the LLM
-        messages = [system_message] + self.conversation_history
+        try:
+            # Check if the LLM wants to call the function
+            if tool_calls:
+                # Add the assistant's response to conversation history
+                self._messages.append({
+                    "role": "assistant",
+                    "content": content,
+                    "tool_calls": tool_calls
+                })
+                
+                # Execute the function call
+                tool_call = tool_calls[0]
+                function_name = tool_call["function"]["name"]
+                function_args = orjson.loads(tool_call["function"]["arguments"])
+                
+                print(f"🔧 LLM is calling function: {function_name}")
+                print(f"📋 Arguments: {json.dumps(function_args, indent=2)}\n")
+                
+                # Call the measure_uncertainty function, unless the measurement
+                # started during streaming used exactly these arguments
+                params = _measurement_params(function_args.get("prompt", user_message), function_args)
+                if speculative is not None and speculative[0] == params:
+                    uncertainty_results = await speculative[1]
+                else:
+                    if speculative is not None:
+                        speculative[1].cancel()
+                        await asyncio.gather(speculative[1], return_exceptions=True)
+                    uncertainty_results = await self._measure_uncertainty(*params)
+                
+                # Format the results
+                formatted_results = self.uncertainty_measurer.format_results(uncertainty_results)
+                
+                # Add function result to conversation history
+                self._messages.append({
+                    "role": "tool",
+                    "tool_call_id": tool_call["id"],
+                    "content": _tool_result_content(uncertainty_results)
+                })
+                
+                analysis = uncertainty_results["uncertainty_analysis"]
+                if (
+                    self.skip_second_call
+                    and not uncertainty_results.get("is_uncertain")
+                    and uncertainty_results.get("tool_response")
+                    and "error" not in analysis
+                ):
+                    # A confident tool answer needs no rewording by the LLM, so
+                    # compose the reply locally and save a round trip
+                    final_message = (
+                        f"{uncertainty_results['tool_response']}\n\n"
+                        f"(Confidence: {analysis['uncertainty_level']})"
+                    )
+                else:
+                    # Get the final response from the LLM
+                    final_response = await retrying(self.uncertainty_measurer.max_retries)(
+                        self.client.chat.completions.create,
+                        model=self.model,
+                        messages=self._messages
+                    )
+                    self._record_usage(final_response)
+                    
+                    final_message = final_response.choices[0].message.content
+                
+                # Add final response to conversation history
+                self._messages.append({
+                    "role": "assistant",
+                    "content": final_message
+                })
+                
+                print(f"\n🤖 Assistant: {final_message}\n")
+                
+                result = {
+                    "user_message": user_message,
+                    "function_called": function_name,
+                    "function_args": function_args,
+                    "uncertainty_results": uncertainty_results,
+                    "formatted_results": formatted_results,
+                    "assistant_response": final_message
+                }
+                
+                if cache_key is not None:
+                    self._cache[cache_key] = (result, self._messages[history_start:])
+                    if len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                
+                return result
+            else:
+                # This shouldn't happen with tool_choice set to required
+                print("⚠️  LLM did not call the function as expected")
+                return {
+                    "user_message": user_message,
+                    "error": "Function was not called",
+                    "assistant_response": content
+                }
+        finally:
+            # A measurement started while streaming that was not awaited
+            # (e.g. the arguments failed to parse) must not keep sampling
+            if speculative is not None and not speculative[1].done():
+                speculative[1].cancel()
+                await asyncio.gather(speculative[1], return_exceptions=True)
+    
+    async def _stream_tool_call(
+        self
+    ) -> Tuple[Optional[str], List[Dict[str, Any]], Optional[Tuple[Tuple[Any, ...], "asyncio.Task"]]]:
+        """
+        Request the forced measure_uncertainty call as a stream.
         
-        # Call the LLM with function calling
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            tools=[self.MEASURE_UNCERTAINTY_FUNCTION],
-            tool_choice={"type": "function", "function": {"name": "measure_uncertainty"}}
+        The call goes to the small ``router_model``; ``model`` is only used to
+        phrase the final answer.
+        
+        As soon as the ``prompt`` argument has fully arrived, the measurement
+        is started with the default values for the other arguments, so it
+        overlaps with the rest of the stream.
+        
+        Returns:
+            Tuple of (message content, tool calls as message dicts, and the
+            speculative measurement as (params, task) or None)
+        """
+        stream = await retrying(self.uncertainty_measurer.max_retries)(
+            self.client.chat.completions.create,
+            model=self.router_model,
+            messages=self._messages,
+            tools=_TOOLS,
+            tool_choice=_TOOL_CHOICE,
+            stream=True,
+            stream_options={"include_usage": True}
         )
         
-        response_message = response.choices[0].message
-        
-        # Check if the LLM wants to call the function
-        if response_message.tool_calls:
-            # Add the assistant's response to conversation history
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": response_message.content,
-                "tool_calls": [
-                    {
-                        "id": tc.id,
-                        "type": tc.type,
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments
-                        }
-                    }
-                    for tc in response_message.tool_calls
-                ]
-            })
-            
-            # Execute the function call
-            tool_call = response_message.tool_calls[0]
-            function_name = tool_call.function.name
-            function_args = json.loads(tool_call.function.arguments)
-            
-            print(f"🔧 LLM is calling function: {function_name}")
-            print(f"📋 Arguments: {json.dumps(function_args, indent=2)}\n")
-            
-            # Call the measure_uncertainty function
-            uncertainty_results = self.uncertainty_measurer.measure_uncertainty(
-                prompt=function_args.get("prompt", user_message),
-                num_samples=function_args.get("num_samples", 5),
-                temperature=function_args.get("temperature", 0.7),
-                uncertainty_threshold=function_args.get("uncertainty_threshold", 1.0)
-            )
-            
-            # Format the results
-            formatted_results = self.uncertainty_measurer.format_results(uncertainty_results)
-            
-            # Prepare tool response with both analysis and the actual response
-            tool_content = {
-                "analysis": uncertainty_results["uncertainty_analysis"],
-                "is_uncertain": uncertainty_results.get("is_uncertain", False),
-                "tool_response": uncertainty_results.get("tool_response", "")
-            }
-            
-            # Add function result to conversation history
-            self.conversation_history.append({
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": json.dumps(tool_content)
-            })
-            
-            # Get the final response from the LLM
-            final_response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[system_message] + self.conversation_history
-            )
-            
-            final_message = final_response.choices[0].message.content
-            
-            # Add final response to conversation history
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": final_message
-            })
-            
-            print(f"\n🤖 Assistant: {final_message}\n")
+        content_parts = []
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+        speculative = None
+        try:
+            async for chunk in stream:
+                if chunk.usage:
+                    self._record_usage(chunk)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                for tc in delta.tool_calls or []:
+                    entry = tool_calls.setdefault(tc.index, {
+                        "id": None,
+                        "type": "function",
+                        "function": {"name": "", "arguments": ""}
+                    })
+                    if tc.id:
+                        entry["id"] = tc.id
+                    if tc.function and tc.function.name:
+                        entry["function"]["name"] += tc.function.name
+                    if tc.function and tc.function.arguments:
+                        entry["function"]["arguments"] += tc.function.arguments
+                
+                if speculative is None and 0 in tool_calls:
+                    prompt = _completed_prompt_argument(tool_calls[0]["function"]["arguments"])
+                    if prompt is not None:
+                        params = _measurement_params(prompt, {})
+                        speculative = (params, asyncio.ensure_future(self._measure_uncertainty(*params)))
+        except BaseException:
+            # Nobody will await the measurement, so stop it from sampling on
+            if speculative is not None:
+                speculative[1].cancel()
+                await asyncio.gather(speculative[1], return_exceptions=True)
+            raise
+        
+        content = "".join(content_parts) if content_parts else None
+        return content, [tool_calls[index] for index in sorted(tool_calls)], speculative
+    
+    async def _measure_uncertainty(
+        self,
+        prompt: str,
+        num_samples: int,
+        temperature: float,
+        uncertainty_threshold: float
+    ) -> Dict[str, Any]:
+        """
+        Run the measure_uncertainty tool, consulting the semantic cache first.
+        
+        Args:
+            prompt: The prompt to measure
+            num_samples: Number of samples
+            temperature: Sampling temperature
+            uncertainty_threshold: Threshold for ratio comparison
             
-            return {
-                "user_message": user_message,
-                "function_called": function_name,
-                "function_args": function_args,
-                "uncertainty_results": uncertainty_results,
-                "formatted_results": formatted_results,
-                "assistant_response": final_message
-            }
-        else:
-            # This shouldn't happen with tool_choice set to required
-            print("⚠️  LLM did not call the function as expected")
-            return {
-                "user_message": user_message,
-                "error": "Function was not called",
-                "assistant_response": response_message.content
-            }
+        Returns:
+            Uncertainty results dictionary
+        """
+        params = (num_samples, temperature, uncertainty_threshold)
+        embedding = None
+        if self.semantic_cache is not None:
+            # Embed with the client of the loop this runs on
+            self.semantic_cache.client = self.client
+            embedding = await self.semantic_cache.aembed(prompt)
+            if embedding is not None:
+                cached = self.semantic_cache.lookup(embedding, params)
+                if cached is not None:
+                    print("♻️  Reusing uncertainty results of a similar earlier prompt")
+                    return cached
+        
+        uncertainty_results = await self.uncertainty_measurer.ameasure_uncertainty(
+            prompt=prompt,
+            num_samples=num_samples,
+            temperature=temperature,
+            uncertainty_threshold=uncertainty_threshold
+        )
+        
+        if embedding is not None:
+            self.semantic_cache.add(embedding, uncertainty_results, params)
+        
+        return uncertainty_results
     
     def reset_conversation(self):
         """Reset the conversation history."""
-        self.conversation_history = []
+        self._messages = [SYSTEM_MESSAGE]
+        self.cached_tokens = 0
         print("\n🔄 Conversation history reset\n")
@@ -5,10 +5,231 @@ This module implements the measure_uncertainty function that queries an LLM
 multiple times to measure uncertainty in the responses by analyzing token logits.
 """
 
+import io
 import os
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
-import json
+import re
+import sys
+import time
+import zlib
+import asyncio
+import hashlib
+import logging
+import statistics
+from dataclasses import dataclass
+from typing import ClassVar, List, Dict, Any, Optional, Tuple
+import numpy as np
+import orjson
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from tenacity import AsyncRetrying
+from src._async import run_sync
+from src._client import aclose_client, get_async_client, retrying
+from src.cache import CacheBackend, LRUCache
+
+# Horizontal rules for the formatted results
+_HR = "=" * 80
+_HR2 = "-" * 80
+
+logger = logging.getLogger(__name__)
+
+# Phrases whose logprobs form the baseline the answers are compared against
+DEFAULT_UNCERTAINTY_PHRASES = ("I'm not sure", "I'm insecure", "I need help")
+
+# Upper bound for the exponential backoff between batch status checks
+_MAX_BATCH_POLL_INTERVAL = 600.0
+
+# With the fast path, an expired baseline is reused when the certainty ratio
+# it gives is more than this factor away from the threshold on either side
+_FAST_PATH_MARGIN = 1.5
+
+# MinHash parameters: h(x) = (a * x + b) mod p over 32-bit word hashes, so the
+# products stay below 2**64 and never overflow uint64
+_MINHASH_NUM_PERM = 64
+_MINHASH_PRIME = np.uint64((1 << 61) - 1)
+_minhash_rng = np.random.default_rng(0)
+_MINHASH_A = _minhash_rng.integers(1, 1 << 32, size=(_MINHASH_NUM_PERM, 1), dtype=np.uint64)
+_MINHASH_B = _minhash_rng.integers(0, 1 << 32, size=(_MINHASH_NUM_PERM, 1), dtype=np.uint64)
+_WORD_RE = re.compile(r"\w+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Responses shorter than this are interned, so identical completions share
+# one string object and compare by identity
+_INTERN_MAX_LENGTH = 4096
+
+
+@dataclass
+class LogprobStream:
+    """
+    Token logprobs of one response, stored column-wise.
+    
+    The API returns one object per token; keeping just the token strings and
+    a float32 array of their logprobs is far smaller and lets the statistics
+    work on the array directly.
+    """
+    tokens: List[str]
+    logprobs: np.ndarray
+    
+    @classmethod
+    def from_logprobs(cls, logprobs_data: Any) -> "LogprobStream":
+        """
+        Convert a choice's ``logprobs`` field from the API.
+        
+        Args:
+            logprobs_data: Logprobs object with a ``content`` list of tokens
+            
+        Returns:
+            LogprobStream with the tokens that have a logprob
+        """
+        content = [
+            t for t in (logprobs_data.content or []) if t.logprob is not None
+        ] if logprobs_data is not None else []
+        return cls(
+            tokens=[t.token for t in content],
+            logprobs=np.fromiter(
+                (t.logprob for t in content), dtype=np.float32, count=len(content)
+            )
+        )
+    
+    @classmethod
+    def from_json(cls, logprobs_json: Optional[Dict[str, Any]]) -> "LogprobStream":
+        """
+        Convert a choice's ``logprobs`` field from a raw JSON response body.
+        
+        Args:
+            logprobs_json: Decoded ``logprobs`` object with a ``content`` list
+            
+        Returns:
+            LogprobStream with the tokens that have a logprob
+        """
+        content = [
+            t for t in (logprobs_json.get("content") or []) if t.get("logprob") is not None
+        ] if logprobs_json else []
+        return cls(
+            tokens=[t["token"] for t in content],
+            logprobs=np.fromiter(
+                (t["logprob"] for t in content), dtype=np.float32, count=len(content)
+            )
+        )
+
+
+@dataclass
+class BatchJob:
+    """
+    A submitted Batch API job and what is needed to read its results back.
+    
+    Plain data, so a job submitted in one process can be saved and awaited
+    from another.
+    """
+    batch_id: str
+    prompts: List[str]
+    num_samples: int
+    # Uncertainty phrases probed in the batch, as "phrase:{index}" rows
+    phrases: Tuple[str, ...]
+
+
+def _collect_logprobs(streams: List[Optional[LogprobStream]]) -> np.ndarray:
+    """
+    Gather the token logprobs of several responses into one flat array.
+    
+    Args:
+        streams: Logprob streams per response (entries may be None)
+        
+    Returns:
+        1-D float array of all token logprobs
+    """
+    arrays = [stream.logprobs for stream in streams if stream is not None]
+    if not arrays:
+        return np.empty(0, dtype=np.float32)
+    if len(arrays) == 1:
+        # A single response (e.g. a phrase probe) needs no copy
+        return arrays[0]
+    return np.concatenate(arrays)
+
+
+def _intern_response(text: Optional[str]) -> Optional[str]:
+    """
+    Intern a short response text.
+    
+    At low temperature many samples are textually identical; interning makes
+    them one object, so deduplicating them is a pointer comparison and the
+    sample cache stores the text once.
+    
+    Args:
+        text: Response text from the API (may be None)
+        
+    Returns:
+        The interned text, or the text unchanged if it is empty or long
+    """
+    if text and len(text) < _INTERN_MAX_LENGTH:
+        return sys.intern(text)
+    return text
+
+
+def _canonicalize(text: str) -> str:
+    """
+    Normalize a response so trivially different copies compare equal.
+    
+    Args:
+        text: Response text
+        
+    Returns:
+        Lower-cased text with collapsed whitespace and no trailing punctuation
+    """
+    return _WHITESPACE_RE.sub(" ", text.lower()).strip().rstrip(".!?;:,").rstrip()
+
+
+def _minhash_signature(text: str) -> np.ndarray:
+    """
+    Compute the MinHash signature of a text's set of words.
+    
+    Args:
+        text: The text to sign
+        
+    Returns:
+        Array of ``_MINHASH_NUM_PERM`` minimum hash values
+    """
+    words = set(_WORD_RE.findall(text.lower())) or {text.strip()}
+    hashes = np.fromiter(
+        (zlib.crc32(word.encode("utf-8")) for word in words),
+        dtype=np.uint64,
+        count=len(words)
+    )
+    return ((_MINHASH_A * hashes + _MINHASH_B) % _MINHASH_PRIME).min(axis=1)
+
+
+def _count_distinct_responses(responses: List[str], threshold: float) -> int:
+    """
+    Count responses that are not near-duplicates of one another.
+    
+    Responses are greedily grouped with the first earlier response whose
+    estimated word-set Jaccard similarity is at least ``threshold``, so
+    reorderings and paraphrases such as "Paris is the capital of France." and
+    "The capital of France is Paris." count once.
+    
+    Args:
+        responses: Response texts (no None entries)
+        threshold: Minimum estimated Jaccard similarity to count as the same
+        
+    Returns:
+        Number of distinct groups
+    """
+    # Exact copies up to case, spacing and final punctuation ("Paris." and
+    # "paris") are merged up front, so only distinct texts are signed.
+    # Identical (interned) responses are dropped first, so each text is
+    # canonicalized once.
+    distinct = list(dict.fromkeys(_canonicalize(r) for r in dict.fromkeys(responses)))
+    # Group signatures, filled row by row; each new signature is compared
+    # against all earlier rows at once as a uint64 matrix
+    heads = np.empty((len(distinct), _MINHASH_NUM_PERM), dtype=np.uint64)
+    count = 0
+    for response in distinct:
+        signature = _minhash_signature(response)
+        if count and (heads[:count] == signature).mean(axis=1).max() >= threshold:
+            continue
+        heads[count] = signature
+        count += 1
+    return count
+
 
 
 class UncertaintyMeasurer:
@@ -17,87 +238,561 @@ class UncertaintyMeasurer:
     multiple times and analyzing the token logits.
     """
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4"):
+    # (model, phrase) -> (time fetched, mean logprob). Shared by all measurers,
+    # since the phrase queries are the same for every instance using a model
+    _phrase_logprob_cache: ClassVar[Dict[Tuple[str, str], Tuple[float, float]]] = {}
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = "gpt-4",
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        baseline_ttl: float = 3600.0,
+        similarity_threshold: float = 0.7,
+        stream_plateau_eps: Optional[float] = None,
+        stream_min_tokens: int = 5,
+        system_prompt: Optional[str] = None,
+        sample_cache_size: int = 256,
+        cache_any_temperature: bool = False,
+        cache_backend: Optional[CacheBackend] = None,
+        early_exit_eps: Optional[float] = None,
+        early_exit_min_samples: int = 3,
+        fast_path: bool = True
+    ):
         """
         Initialize the UncertaintyMeasurer.
         
         Args:
             api_key: OpenAI API key. If None, uses OPENAI_API_KEY environment variable
             model: The model to use for generating responses
+            max_concurrency: Maximum number of API requests in flight at once
+            max_retries: Retries per request, after the first attempt, on rate
+                limits, timeouts, dropped connections and 5xx errors
+            baseline_ttl: Seconds to reuse cached uncertainty-phrase logprobs before re-querying
+            similarity_threshold: Word-overlap (Jaccard) similarity at which two responses
+                count as the same answer when measuring diversity
+            stream_plateau_eps: If set, samples are streamed and cut off once the
+                standard deviation of their token logprobs drops below this value.
+                Saves output tokens on confident answers, but the stored response
+                texts are then truncated.
+            stream_min_tokens: Tokens to read before a streamed sample may stop early
+            system_prompt: Optional fixed system message sent before the prompt in
+                every sample. Keep it static (no timestamps or sample numbers) so
+                the request prefix stays identical and can hit OpenAI's prompt cache.
+            sample_cache_size: Number of sampled requests whose responses are kept
+                for reuse (0 disables the cache)
+            cache_any_temperature: Also reuse samples taken at a temperature above
+                0.0. Off by default, since repeated sampling is the point there.
+            cache_backend: Store for the cached samples (anything with ``get`` and
+                ``set``, e.g. a ``diskcache.Cache`` to keep them across runs).
+                Defaults to an in-memory LRU of ``sample_cache_size`` entries.
+            early_exit_eps: If set, the remaining samples are cancelled once all
+                finished ones give the same answer and the standard deviation of
+                their mean logprobs is below this value. Saves requests on easy
+                prompts; skipped samples are left as None.
+            early_exit_min_samples: Finished samples needed before stopping early
+            fast_path: When the phrase baseline has expired, decide with the old
+                values if the answer is clearly confident or clearly uncertain
+                either way, and only re-query the phrases for close calls
         """
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         self.model = model
-        self.client = OpenAI(api_key=self.api_key)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.baseline_ttl = baseline_ttl
+        self.similarity_threshold = similarity_threshold
+        self.stream_plateau_eps = stream_plateau_eps
+        self.stream_min_tokens = stream_min_tokens
+        self.early_exit_eps = early_exit_eps
+        self.early_exit_min_samples = early_exit_min_samples
+        self.fast_path = fast_path
+        # Built once so every sample shares a byte-identical message prefix
+        self._system_messages: Tuple[Dict[str, str], ...] = (
+            ({"role": "system", "content": system_prompt},) if system_prompt else ()
+        )
+        # Created lazily: a semaphore must belong to the loop that awaits it
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._sem_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.sample_cache_size = sample_cache_size
+        self.cache_any_temperature = cache_any_temperature
+        # Request hash -> (responses, logprobs); None disables caching
+        self._sample_cache: Optional[CacheBackend] = cache_backend
+        if cache_backend is None and sample_cache_size > 0:
+            self._sample_cache = LRUCache(sample_cache_size)
+        # Phrase -> probe request arguments, built once on first use
+        self._phrase_requests: Dict[str, Dict[str, Any]] = {}
+        
+    @property
+    def client(self) -> AsyncOpenAI:
+        """
+        The shared API client for the running event loop.
         
+        Looked up on every use rather than stored, since pooled connections
+        belong to one loop: a measurer built from synchronous code and then
+        awaited under ``asyncio.run`` must not reuse the background loop's pool.
+        """
+        return get_async_client(api_key=self.api_key)
+    
+    async def aclose(self):
+        """Close the measurer's API client and its pooled connections."""
+        await aclose_client(self.client)
+    
+    async def __aenter__(self) -> "UncertaintyMeasurer":
+        return self
+    
+    async def __aexit__(self, *exc_info: Any):
+        await self.aclose()
+    
     def measure_uncertainty(
         self,
         prompt: str,
         num_samples: int = 5,
         temperature: float = 0.7,
         max_tokens: int = 500,
-        uncertainty_threshold: float = 1.0
+        uncertainty_threshold: float = 1.0,
+        use_batch: bool = False
     ) -> Dict[str, Any]:
         """
         Measure uncertainty by querying the LLM multiple times.
         
+        Synchronous wrapper around ``ameasure_uncertainty``.
+        
         Args:
             prompt: The user's prompt to send to the LLM
             num_samples: Number of times to query the LLM (default: 5)
             temperature: Temperature for sampling (higher = more diverse)
             max_tokens: Maximum tokens in the response
             uncertainty_threshold: Threshold for ratio comparison (default: 1.0)
+            use_batch: Send the samples as one Batch API job instead of
+                concurrent requests (half the cost, but may take hours)
             
         Returns:
             A dictionary containing:
                 - responses: List of response texts
-                - logprobs: List of log probabilities for each response
+                - logprobs: LogprobStream of each response (None for failed samples)
                 - uncertainty_score: A calculated uncertainty metric
                 - analysis: Analysis of the uncertainty
                 - is_uncertain: Boolean indicating if LLM is uncertain
                 - tool_response: Response based on certainty level
         """
-        responses = []
-        all_logprobs = []
+        return run_sync(self.ameasure_uncertainty(
+            prompt,
+            num_samples=num_samples,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            uncertainty_threshold=uncertainty_threshold,
+            use_batch=use_batch
+        ))
+    
+    async def ameasure_uncertainty(
+        self,
+        prompt: str,
+        num_samples: int = 5,
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        uncertainty_threshold: float = 1.0,
+        use_batch: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Measure uncertainty by querying the LLM multiple times concurrently.
         
-        print(f"\n🔍 Measuring uncertainty by querying the LLM {num_samples} times...\n")
+        All samples are dispatched at once, so the wall time is roughly that
+        of a single request rather than ``num_samples`` of them.
         
-        for i in range(num_samples):
-            try:
-                # Query the LLM with logprobs enabled
-                completion = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    logprobs=True,
-                    top_logprobs=5  # Get top 5 alternative tokens at each position
+        Args:
+            prompt: The user's prompt to send to the LLM
+            num_samples: Number of times to query the LLM (default: 5)
+            temperature: Temperature for sampling (higher = more diverse)
+            max_tokens: Maximum tokens in the response
+            uncertainty_threshold: Threshold for ratio comparison (default: 1.0)
+            use_batch: Send the samples as one Batch API job instead of
+                concurrent requests (half the cost, but may take hours)
+            
+        Returns:
+            Same dictionary as ``measure_uncertainty``
+        """
+        if use_batch:
+            # Large sample counts are cheaper and avoid rate limits as a batch
+            results = await self.ameasure_uncertainty_batch(
+                [prompt],
+                num_samples=num_samples,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                uncertainty_threshold=uncertainty_threshold
+            )
+            return results[0]
+        
+        cache_key = None
+        if self._sample_cache is not None and (temperature == 0.0 or self.cache_any_temperature):
+            cache_key = self._sample_cache_key(prompt, num_samples, temperature, max_tokens)
+            cached = self._sample_cache.get(cache_key)
+            if cached is not None:
+                print("\n♻️  Reusing cached samples for this prompt")
+                return await self._build_results(
+                    prompt, num_samples, list(cached[0]), list(cached[1]), uncertainty_threshold
                 )
-                
-                response_text = completion.choices[0].message.content
-                logprobs_data = completion.choices[0].logprobs
-                
-                responses.append(response_text)
-                all_logprobs.append(logprobs_data)
-                
-                print(f"✓ Sample {i+1}/{num_samples} completed")
-                
-            except Exception as e:
-                print(f"✗ Error in sample {i+1}: {str(e)}")
-                responses.append(None)
-                all_logprobs.append(None)
         
-        # Calculate mean logprob of answers
-        answer_mean_logprob = self._calculate_mean_logprob(all_logprobs)
+        print(f"\n🔍 Measuring uncertainty by querying the LLM {num_samples} times...\n")
+        
+        # An expired but complete baseline, for the fast path to decide with
+        stale_baseline = None
+        phrase_count = len(DEFAULT_UNCERTAINTY_PHRASES)
+        if self.fast_path and len(self._cached_phrase_logprobs(DEFAULT_UNCERTAINTY_PHRASES)) < phrase_count:
+            stale_baseline = self._cached_phrase_logprobs(DEFAULT_UNCERTAINTY_PHRASES, max_age=float("inf"))
+            if len(stale_baseline) < phrase_count:
+                stale_baseline = None
+        
+        if stale_baseline is None:
+            # The phrase baseline does not depend on the samples, so it is
+            # queried alongside them instead of after them
+            samples, phrase_logprobs = await asyncio.gather(
+                self._collect_samples(prompt, num_samples, temperature, max_tokens),
+                self._compute_uncertainty_baseline(DEFAULT_UNCERTAINTY_PHRASES)
+            )
+        else:
+            # An expired baseline may still settle the decision; whether it
+            # needs refreshing is only known once the samples are in
+            samples = await self._collect_samples(prompt, num_samples, temperature, max_tokens)
+            phrase_logprobs = None
+        
+        # Failed and skipped samples keep their slot as None so the analysis
+        # skips them
+        responses = [None] * num_samples
+        all_logprobs = [None] * num_samples
+        for i, sample in enumerate(samples):
+            if isinstance(sample, Exception):
+                print(f"✗ Error in sample {i+1}: {str(sample)}")
+            elif sample is not None:
+                responses[i], all_logprobs[i] = sample
+        completed = num_samples - responses.count(None)
+        print(f"✓ {completed}/{num_samples} samples completed")
+        
+        if phrase_logprobs is None:
+            if self._clear_of_threshold(
+                self._calculate_mean_logprob(all_logprobs), stale_baseline, uncertainty_threshold
+            ):
+                print("\n📊 Reusing expired uncertainty-phrase logprobs; the decision is clear-cut")
+                phrase_logprobs = stale_baseline
+            else:
+                phrase_logprobs = await self._compute_uncertainty_baseline(DEFAULT_UNCERTAINTY_PHRASES)
+        
+        # Only complete sample sets are reused; a retry should refill the gaps
+        if cache_key is not None and None not in responses:
+            self._sample_cache.set(cache_key, (responses, all_logprobs))
+        
+        return await self._build_results(
+            prompt, num_samples, responses, all_logprobs, uncertainty_threshold, phrase_logprobs
+        )
+    
+    def measure_uncertainty_batch(
+        self,
+        prompts: List[str],
+        num_samples: int = 5,
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        uncertainty_threshold: float = 1.0,
+        poll_interval: float = 30.0
+    ) -> List[Dict[str, Any]]:
+        """
+        Measure uncertainty for several prompts through the OpenAI Batch API.
+        
+        Synchronous wrapper around ``ameasure_uncertainty_batch``.
+        
+        Args:
+            prompts: The prompts to measure
+            num_samples: Number of samples per prompt (default: 5)
+            temperature: Temperature for sampling (higher = more diverse)
+            max_tokens: Maximum tokens in each response
+            uncertainty_threshold: Threshold for ratio comparison (default: 1.0)
+            poll_interval: Seconds to wait before the first batch status check;
+                the wait doubles after every check, up to 10 minutes
+            
+        Returns:
+            One ``measure_uncertainty`` results dictionary per prompt, in order
+        """
+        return run_sync(self.ameasure_uncertainty_batch(
+            prompts,
+            num_samples=num_samples,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            uncertainty_threshold=uncertainty_threshold,
+            poll_interval=poll_interval
+        ))
+    
+    async def ameasure_uncertainty_batch(
+        self,
+        prompts: List[str],
+        num_samples: int = 5,
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        uncertainty_threshold: float = 1.0,
+        poll_interval: float = 30.0
+    ) -> List[Dict[str, Any]]:
+        """
+        Measure uncertainty for several prompts through the OpenAI Batch API.
+        
+        All ``len(prompts) * num_samples`` sampling requests, plus the
+        uncertainty-phrase queries that are not cached, are submitted as one
+        batch job, which is billed at roughly half the price of regular
+        requests but may take up to 24 hours to complete. Use this for
+        offline comparisons where nobody is waiting on a single answer.
+        Clarification messages still use regular requests.
+        
+        Equivalent to ``asubmit_batch`` followed by ``aawait_batch``.
+        
+        Args:
+            prompts: The prompts to measure
+            num_samples: Number of samples per prompt (default: 5)
+            temperature: Temperature for sampling (higher = more diverse)
+            max_tokens: Maximum tokens in each response
+            uncertainty_threshold: Threshold for ratio comparison (default: 1.0)
+            poll_interval: Seconds to wait before the first batch status check;
+                the wait doubles after every check, up to 10 minutes
+            
+        Returns:
+            One ``measure_uncertainty`` results dictionary per prompt, in order
+            
+        Raises:
+            RuntimeError: If the batch fails, expires or is cancelled
+        """
+        job = await self.asubmit_batch(
+            prompts,
+            num_samples=num_samples,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return await self.aawait_batch(
+            job,
+            uncertainty_threshold=uncertainty_threshold,
+            poll_interval=poll_interval
+        )
+    
+    def submit_batch(
+        self,
+        prompts: List[str],
+        num_samples: int = 5,
+        temperature: float = 0.7,
+        max_tokens: int = 500
+    ) -> BatchJob:
+        """
+        Submit a Batch API job without waiting for it.
+        
+        Synchronous wrapper around ``asubmit_batch``.
+        
+        Args:
+            prompts: The prompts to measure
+            num_samples: Number of samples per prompt (default: 5)
+            temperature: Temperature for sampling (higher = more diverse)
+            max_tokens: Maximum tokens in each response
+            
+        Returns:
+            The submitted job, to pass to ``await_batch``
+        """
+        return run_sync(self.asubmit_batch(
+            prompts,
+            num_samples=num_samples,
+            temperature=temperature,
+            max_tokens=max_tokens
+        ))
+    
+    async def asubmit_batch(
+        self,
+        prompts: List[str],
+        num_samples: int = 5,
+        temperature: float = 0.7,
+        max_tokens: int = 500
+    ) -> BatchJob:
+        """
+        Submit the sampling and uncertainty-phrase requests as one batch job.
+        
+        Args:
+            prompts: The prompts to measure
+            num_samples: Number of samples per prompt (default: 5)
+            temperature: Temperature for sampling (higher = more diverse)
+            max_tokens: Maximum tokens in each response
+            
+        Returns:
+            The submitted job, to pass to ``aawait_batch``
+        """
+        cached_phrases = self._cached_phrase_logprobs(DEFAULT_UNCERTAINTY_PHRASES)
+        phrases = tuple(p for p in DEFAULT_UNCERTAINTY_PHRASES if p not in cached_phrases)
+        
+        requests = [
+            orjson.dumps({
+                "custom_id": f"{prompt_index}:sample:{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": self._sample_messages(prompt),
+                    "temperature": temperature,
+                    "max_tokens": max_tokens,
+                    "logprobs": True
+                }
+            })
+            for prompt_index, prompt in enumerate(prompts)
+            for i in range(num_samples)
+        ] + [
+            orjson.dumps({
+                "custom_id": f"phrase:{j}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._phrase_request(phrase)
+            })
+            for j, phrase in enumerate(phrases)
+        ]
+        
+        print(f"\n📦 Submitting {len(requests)} requests as one batch job...")
+        batch_file = await self.client.files.create(
+            file=("uncertainty_batch.jsonl", b"\n".join(requests)),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return BatchJob(
+            batch_id=batch.id,
+            prompts=list(prompts),
+            num_samples=num_samples,
+            phrases=phrases
+        )
+    
+    def await_batch(
+        self,
+        job: BatchJob,
+        uncertainty_threshold: float = 1.0,
+        poll_interval: float = 30.0
+    ) -> List[Dict[str, Any]]:
+        """
+        Wait for a submitted batch job and analyze its samples.
+        
+        Synchronous wrapper around ``aawait_batch``.
+        
+        Args:
+            job: Job returned by ``submit_batch``
+            uncertainty_threshold: Threshold for ratio comparison (default: 1.0)
+            poll_interval: Seconds to wait before the first batch status check;
+                the wait doubles after every check, up to 10 minutes
+            
+        Returns:
+            One ``measure_uncertainty`` results dictionary per prompt, in order
+        """
+        return run_sync(self.aawait_batch(
+            job,
+            uncertainty_threshold=uncertainty_threshold,
+            poll_interval=poll_interval
+        ))
+    
+    async def aawait_batch(
+        self,
+        job: BatchJob,
+        uncertainty_threshold: float = 1.0,
+        poll_interval: float = 30.0
+    ) -> List[Dict[str, Any]]:
+        """
+        Wait for a submitted batch job and analyze its samples.
+        
+        Args:
+            job: Job returned by ``asubmit_batch``
+            uncertainty_threshold: Threshold for ratio comparison (default: 1.0)
+            poll_interval: Seconds to wait before the first batch status check;
+                the wait doubles after every check, up to 10 minutes
+            
+        Returns:
+            One ``measure_uncertainty`` results dictionary per prompt, in order
+            
+        Raises:
+            RuntimeError: If the batch fails, expires or is cancelled
+        """
+        # Small batches often finish within minutes, large ones can take
+        # hours, so poll quickly at first and back off exponentially
+        delay = poll_interval
+        while True:
+            await asyncio.sleep(delay)
+            batch = await self.client.batches.retrieve(job.batch_id)
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                break
+            delay = min(delay * 2, _MAX_BATCH_POLL_INTERVAL)
+            print(f"⏳ Batch {batch.id} is {batch.status}, checking again in {delay:g}s")
+        
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}'")
+        
+        completions = {}
+        if batch.output_file_id:
+            output = await self.client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                row = orjson.loads(line)
+                response = row.get("response")
+                if response and response.get("status_code") == 200:
+                    completions[row["custom_id"]] = ChatCompletion.construct(**response["body"])
+                else:
+                    print(f"✗ Error in batch request {row['custom_id']}: {row.get('error')}")
+        
+        # Phrase results from the batch go into the shared cache; phrases whose
+        # request failed are queried directly below, once for all prompts
+        fetched = time.monotonic()
+        for j, phrase in enumerate(job.phrases):
+            completion = completions.get(f"phrase:{j}")
+            if completion is not None:
+                self._phrase_logprob_cache[(self.model, phrase)] = (fetched, self._calculate_mean_logprob([
+                    LogprobStream.from_logprobs(completion.choices[0].logprobs)
+                ]))
+        phrase_logprobs = await self._compute_uncertainty_baseline(DEFAULT_UNCERTAINTY_PHRASES)
+        
+        builds = [None] * len(job.prompts)
+        for prompt_index, prompt in enumerate(job.prompts):
+            responses = [None] * job.num_samples
+            all_logprobs = [None] * job.num_samples
+            for i in range(job.num_samples):
+                completion = completions.get(f"{prompt_index}:sample:{i}")
+                if completion is not None:
+                    responses[i] = _intern_response(completion.choices[0].message.content)
+                    all_logprobs[i] = LogprobStream.from_logprobs(completion.choices[0].logprobs)
+            builds[prompt_index] = self._build_results(
+                prompt, job.num_samples, responses, all_logprobs, uncertainty_threshold,
+                dict(phrase_logprobs)
+            )
+        
+        return list(await asyncio.gather(*builds))
+    
+    async def _build_results(
+        self,
+        prompt: str,
+        num_samples: int,
+        responses: List[Optional[str]],
+        all_logprobs: List[Optional[LogprobStream]],
+        uncertainty_threshold: float,
+        phrase_logprobs: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Turn collected samples into the uncertainty results dictionary.
+        
+        Args:
+            prompt: The prompt that was sampled
+            num_samples: Number of samples requested
+            responses: Response texts (None for failed samples)
+            all_logprobs: Logprob stream per sample (None for failed samples)
+            uncertainty_threshold: Threshold for ratio comparison
+            phrase_logprobs: Uncertainty-phrase baseline if already fetched;
+                queried (or taken from the cache) when None
+            
+        Returns:
+            Same dictionary as ``measure_uncertainty``
+        """
+        # Mean logprob and confidence of the answers, from one pass over the tokens
+        summary = self._summarize_logprobs(all_logprobs)
+        answer_mean_logprob = summary[0]
         
         # Calculate mean logprob of uncertainty phrases
-        print("\n📊 Calculating logprobs for uncertainty phrases...")
-        uncertainty_phrases = ["I'm not sure", "I'm insecure", "I need help"]
-        phrase_logprobs = self._get_phrase_logprobs(uncertainty_phrases)
+        if phrase_logprobs is None:
+            phrase_logprobs = await self._compute_uncertainty_baseline(DEFAULT_UNCERTAINTY_PHRASES)
         
         # Calculate mean of uncertainty phrase logprobs
-        uncertainty_phrase_mean = sum(phrase_logprobs.values()) / len(phrase_logprobs) if phrase_logprobs else 0.0
+        uncertainty_phrase_mean = statistics.fmean(phrase_logprobs.values()) if phrase_logprobs else 0.0
         
         # Calculate ratio (avoiding division by zero)
         if uncertainty_phrase_mean != 0:
@@ -113,17 +808,19 @@ class UncertaintyMeasurer:
         print(f"⚖️  Certainty ratio: {certainty_ratio:.4f} (threshold: {uncertainty_threshold})")
         print(f"{'❓ LLM is UNCERTAIN' if is_uncertain else '✅ LLM is CONFIDENT'}")
         
+        # Failed samples are dropped once here for everything below
+        valid_responses = [r for r in responses if r is not None]
+        
         # Generate appropriate response based on certainty
         if is_uncertain:
             # Generate "I'm unsure about" message
-            tool_response = self._generate_uncertainty_message(prompt, responses)
+            tool_response = await self._generate_uncertainty_message(prompt, valid_responses)
         else:
             # Return the most common or first valid response
-            valid_responses = [r for r in responses if r is not None]
             tool_response = valid_responses[0] if valid_responses else "Unable to generate response."
         
         # Analyze uncertainty
-        analysis = self._analyze_uncertainty(responses, all_logprobs)
+        analysis = self._analyze_uncertainty(valid_responses, all_logprobs, summary)
         analysis["answer_mean_logprob"] = round(answer_mean_logprob, 4)
         analysis["uncertainty_phrase_logprobs"] = {k: round(v, 4) for k, v in phrase_logprobs.items()}
         analysis["uncertainty_phrase_mean_logprob"] = round(uncertainty_phrase_mean, 4)
@@ -141,37 +838,290 @@ class UncertaintyMeasurer:
             "tool_response": tool_response
         }
     
+    async def _collect_samples(
+        self,
+        prompt: str,
+        num_samples: int,
+        temperature: float,
+        max_tokens: int
+    ) -> List[Any]:
+        """
+        Take the samples concurrently, stopping early if ``early_exit_eps`` is set.
+        
+        With early exit enabled, a running mean and variance of the finished
+        samples' mean logprobs is kept (Welford's algorithm). Once at least
+        ``early_exit_min_samples`` have finished, all with the same canonical
+        answer and a standard deviation below ``early_exit_eps``, the other
+        samples are cancelled, since they would neither change the diversity
+        nor noticeably move the mean logprob.
+        
+        Args:
+            prompt: The user's prompt to send to the LLM
+            num_samples: Number of samples to take
+            temperature: Temperature for sampling
+            max_tokens: Maximum tokens in each response
+            
+        Returns:
+            Per sample, in order: (response text, logprob stream), the
+            exception it failed with, or None if it was skipped
+        """
+        coros = [
+            self._one_sample(prompt, i, num_samples, temperature, max_tokens)
+            for i in range(num_samples)
+        ]
+        if self.early_exit_eps is None:
+            return await asyncio.gather(*coros, return_exceptions=True)
+        
+        tasks = {asyncio.ensure_future(coro): i for i, coro in enumerate(coros)}
+        samples: List[Any] = [None] * num_samples
+        answers = set()
+        count = 0
+        mean = 0.0
+        m2 = 0.0
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is not None:
+                        samples[tasks[task]] = error
+                        continue
+                    response_text, logprobs_data = samples[tasks[task]] = task.result()
+                    answers.add(_canonicalize(response_text or ""))
+                    value = self._calculate_mean_logprob([logprobs_data])
+                    count += 1
+                    delta = value - mean
+                    mean += delta / count
+                    m2 += delta * (value - mean)
+                
+                if (
+                    pending
+                    and count >= max(self.early_exit_min_samples, 2)
+                    and len(answers) == 1
+                    and (m2 / (count - 1)) ** 0.5 < self.early_exit_eps
+                ):
+                    print(f"⏹️  {count} samples agree, skipping the other {len(pending)}")
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        return samples
+    
+    async def _one_sample(
+        self,
+        prompt: str,
+        index: int,
+        num_samples: int,
+        temperature: float,
+        max_tokens: int
+    ) -> Tuple[str, LogprobStream]:
+        """
+        Query the LLM once for the given prompt.
+        
+        Args:
+            prompt: The user's prompt to send to the LLM
+            index: Zero-based index of this sample (for progress output)
+            num_samples: Total number of samples being taken
+            temperature: Temperature for sampling
+            max_tokens: Maximum tokens in the response
+            
+        Returns:
+            Tuple of (response text, logprob stream)
+            
+        Raises:
+            Exception: If the request fails after retries
+        """
+        request = dict(
+            model=self.model,
+            messages=self._sample_messages(prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            # Only the sampled tokens' logprobs are used, so no alternatives
+            # (top_logprobs) are requested; they would multiply the payload.
+            # Add a flag if a future metric needs them.
+            logprobs=True
+        )
+        # Query the LLM with logprobs enabled
+        if self.stream_plateau_eps is None:
+            completion = await self._create_completion(**request)
+            response_text = completion.choices[0].message.content
+            logprobs_data = LogprobStream.from_logprobs(completion.choices[0].logprobs)
+        else:
+            response_text, logprobs_data = await self._retrying()(
+                self._stream_sample_once, **request
+            )
+        
+        response_text = _intern_response(response_text)
+        
+        # Samples finish in any order, so per-sample progress is debug output;
+        # ameasure_uncertainty prints one summary line instead
+        logger.debug("Sample %d/%d completed", index + 1, num_samples)
+        return response_text, logprobs_data
+    
+    def _sample_cache_key(
+        self,
+        prompt: str,
+        num_samples: int,
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """
+        Hash everything that determines a set of samples.
+        
+        Args:
+            prompt: The user's prompt
+            num_samples: Number of samples
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens per response
+            
+        Returns:
+            Hex digest identifying the request
+        """
+        payload = orjson.dumps({
+            "model": self.model,
+            "messages": self._sample_messages(prompt),
+            "temp": temperature,
+            "n": num_samples,
+            "max": max_tokens
+        }, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+    
+    def _sample_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """
+        Build the messages for one sampling request.
+        
+        Args:
+            prompt: The user's prompt
+            
+        Returns:
+            The fixed system prefix followed by the user message
+        """
+        return [*self._system_messages, {"role": "user", "content": prompt}]
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Return the concurrency-limiting semaphore for the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._sem is None or self._sem_loop is not loop:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            self._sem_loop = loop
+        return self._sem
+    
+    async def _create_completion(self, **kwargs: Any) -> Any:
+        """
+        Create a chat completion, bounded by ``max_concurrency``.
+        
+        Rate-limit and timeout errors are retried with jittered exponential
+        backoff; the semaphore is released while waiting between attempts.
+        
+        Args:
+            **kwargs: Arguments for ``chat.completions.create``
+            
+        Returns:
+            The chat completion
+        """
+        return await self._retrying()(self._create_completion_once, **kwargs)
+    
+    def _retrying(self) -> AsyncRetrying:
+        """Return the retry policy for transient request failures."""
+        return retrying(self.max_retries)
+    
+    async def _create_completion_once(self, **kwargs: Any) -> Any:
+        """Make a single chat completion request while holding the semaphore."""
+        async with self._get_semaphore():
+            return await self.client.chat.completions.create(**kwargs)
+    
+    async def _create_raw_completion_once(self, **kwargs: Any) -> bytes:
+        """Make a single chat completion request and return its unparsed JSON body."""
+        async with self._get_semaphore():
+            response = await self.client.chat.completions.with_raw_response.create(**kwargs)
+            return response.content
+    
+    async def _stream_sample_once(self, **kwargs: Any) -> Tuple[str, LogprobStream]:
+        """
+        Stream one sample, stopping early once the token logprobs plateau.
+        
+        A running mean and variance of the token logprobs is kept (Welford's
+        algorithm). After ``stream_min_tokens`` tokens, the stream is closed as
+        soon as their standard deviation falls below ``stream_plateau_eps``,
+        since further tokens barely move the mean the certainty ratio uses.
+        
+        Args:
+            **kwargs: Arguments for ``chat.completions.create``
+            
+        Returns:
+            Tuple of (possibly truncated response text, logprob stream)
+        """
+        text_parts = []
+        tokens = []
+        logprobs = []
+        mean = 0.0
+        m2 = 0.0
+        
+        async with self._get_semaphore():
+            stream = await self.client.chat.completions.create(stream=True, **kwargs)
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    if choice.delta.content:
+                        text_parts.append(choice.delta.content)
+                    if not (choice.logprobs and choice.logprobs.content):
+                        continue
+                    for token in choice.logprobs.content:
+                        tokens.append(token.token)
+                        logprobs.append(token.logprob)
+                        delta = token.logprob - mean
+                        mean += delta / len(tokens)
+                        m2 += delta * (token.logprob - mean)
+                    if (
+                        len(tokens) >= self.stream_min_tokens
+                        and (m2 / len(tokens)) ** 0.5 < self.stream_plateau_eps
+                    ):
+                        break
+            finally:
+                await stream.close()
+        
+        return "".join(text_parts), LogprobStream(
+            tokens=tokens, logprobs=np.array(logprobs, dtype=np.float32)
+        )
+    
     def _analyze_uncertainty(
         self,
         responses: List[str],
-        logprobs_data: List[Any]
+        logprobs_data: List[Optional[LogprobStream]],
+        summary: Optional[Tuple[float, float, int]] = None
     ) -> Dict[str, Any]:
         """
         Analyze uncertainty across multiple responses.
         
         Args:
-            responses: List of response texts
-            logprobs_data: List of logprobs data from the API
+            responses: Texts of the successful samples (no None entries)
+            logprobs_data: Logprob stream per sample (None entries are skipped)
+            summary: ``_summarize_logprobs`` of ``logprobs_data`` if the caller
+                already has it
             
         Returns:
             Dictionary with uncertainty analysis
         """
-        # Filter out None responses
-        valid_responses = [r for r in responses if r is not None]
-        valid_logprobs = [lp for lp in logprobs_data if lp is not None]
-        
-        if len(valid_responses) == 0:
+        if len(responses) == 0:
             return {
                 "error": "No valid responses received",
                 "uncertainty_level": "unknown"
             }
         
-        # Check response diversity
-        unique_responses = len(set(valid_responses))
-        response_diversity = unique_responses / len(valid_responses)
+        # Check response diversity, treating near-duplicate wordings as one answer
+        unique_responses = _count_distinct_responses(responses, self.similarity_threshold)
+        response_diversity = unique_responses / len(responses)
         
         # Calculate average token confidence from logprobs
-        avg_confidence = self._calculate_average_confidence(valid_logprobs)
+        if summary is None:
+            summary = self._summarize_logprobs(logprobs_data)
+        _, avg_confidence, total_tokens = summary
         
         # Determine uncertainty level
         if response_diversity >= 0.8:
@@ -186,128 +1136,231 @@ class UncertaintyMeasurer:
         
         return {
             "unique_responses": unique_responses,
-            "total_samples": len(valid_responses),
+            "total_samples": len(responses),
             "response_diversity": round(response_diversity, 3),
             "average_token_confidence": round(avg_confidence, 3),
+            "total_tokens": total_tokens,
             "uncertainty_level": uncertainty_level,
             "recommendation": recommendation
         }
     
-    def _calculate_average_confidence(self, logprobs_data: List[Any]) -> float:
+    def _summarize_logprobs(self, logprobs_data: List[Optional[LogprobStream]]) -> Tuple[float, float, int]:
         """
-        Calculate average confidence from logprobs data.
+        Compute the token statistics of several responses in one pass.
+        
+        The streams are gathered into one array once, instead of once per
+        statistic.
         
         Args:
-            logprobs_data: List of logprobs data
+            logprobs_data: Logprob stream per response
             
         Returns:
-            Average confidence score (0-1)
+            Tuple of (mean logprob, average confidence 0-1, number of tokens)
         """
-        if not logprobs_data:
-            return 0.0
+        values = _collect_logprobs(logprobs_data)
+        if values.size == 0:
+            return 0.0, 0.0, 0
         
-        total_confidence = 0.0
-        total_tokens = 0
-        
-        for logprobs in logprobs_data:
-            if logprobs and logprobs.content:
-                for token_logprob in logprobs.content:
-                    if token_logprob.logprob is not None:
-                        # Convert log probability to probability
-                        prob = 2 ** token_logprob.logprob
-                        total_confidence += prob
-                        total_tokens += 1
-        
-        if total_tokens == 0:
-            return 0.0
+        # The API returns natural-log probabilities, so convert with base e.
+        # np.exp runs over the whole array in C (about 40us for 25k tokens),
+        # so a JIT kernel would only save the temporary array.
+        return (
+            float(values.mean(dtype=np.float64)),
+            float(np.exp(values).mean(dtype=np.float64)),
+            int(values.size)
+        )
+    
+    def _calculate_average_confidence(self, logprobs_data: List[Optional[LogprobStream]]) -> float:
+        """
+        Calculate average confidence from logprobs data.
         
-        return total_confidence / total_tokens
+        Args:
+            logprobs_data: Logprob stream per response
+            
+        Returns:
+            Average confidence score (0-1)
+        """
+        return self._summarize_logprobs(logprobs_data)[1]
     
-    def _calculate_mean_logprob(self, logprobs_data: List[Any]) -> float:
+    def _calculate_mean_logprob(self, logprobs_data: List[Optional[LogprobStream]]) -> float:
         """
         Calculate mean log probability from logprobs data.
         
         Args:
-            logprobs_data: List of logprobs data
+            logprobs_data: Logprob stream per response
             
         Returns:
             Mean log probability
         """
-        if not logprobs_data:
+        # Skips the exponentials that only the confidence needs
+        values = _collect_logprobs(logprobs_data)
+        if values.size == 0:
             return 0.0
         
-        total_logprob = 0.0
-        total_tokens = 0
-        
-        for logprobs in logprobs_data:
-            if logprobs and logprobs.content:
-                for token_logprob in logprobs.content:
-                    if token_logprob.logprob is not None:
-                        total_logprob += token_logprob.logprob
-                        total_tokens += 1
-        
-        if total_tokens == 0:
-            return 0.0
+        return float(values.mean(dtype=np.float64))
+    
+    async def aprefetch_baseline(self):
+        """
+        Fetch the uncertainty-phrase baseline ahead of the first measurement.
         
-        return total_logprob / total_tokens
+        The phrases are fixed, so this can run at startup; measurements then
+        find the baseline in the shared cache instead of querying it.
+        """
+        await self._compute_uncertainty_baseline(DEFAULT_UNCERTAINTY_PHRASES)
+    
+    @classmethod
+    def clear_baseline_cache(cls):
+        """Forget the cached uncertainty-phrase logprobs of all measurers."""
+        cls._phrase_logprob_cache.clear()
     
-    def _get_phrase_logprobs(self, phrases: List[str]) -> Dict[str, float]:
+    async def _compute_uncertainty_baseline(self, phrases: Tuple[str, ...]) -> Dict[str, float]:
         """
-        Get mean logprobs for specific phrases by querying the LLM.
+        Get mean logprobs for the uncertainty phrases, reusing recent results.
+        
+        The queries are identical on every call (same model, prompts and
+        temperature 0.0), so each phrase's result is cached per model, across
+        measurers, for ``baseline_ttl`` seconds. Only phrases without a fresh
+        cached result are queried, concurrently. Failed queries are not cached.
         
         Args:
-            phrases: List of phrases to get logprobs for
+            phrases: Phrases to get logprobs for
             
         Returns:
             Dictionary mapping phrases to their mean logprobs
         """
-        phrase_logprobs = {}
+        phrase_logprobs = self._cached_phrase_logprobs(phrases)
+        missing = [phrase for phrase in phrases if phrase not in phrase_logprobs]
+        if not missing:
+            print("\n📊 Using cached logprobs for uncertainty phrases")
+            return phrase_logprobs
         
-        for phrase in phrases:
-            try:
-                # Query the LLM with just the phrase
-                completion = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "user", "content": "Complete this sentence: " + phrase}
-                    ],
-                    temperature=0.0,
-                    max_tokens=10,
-                    logprobs=True,
-                    top_logprobs=5
-                )
-                
-                logprobs_data = completion.choices[0].logprobs
-                mean_logprob = self._calculate_mean_logprob([logprobs_data])
-                phrase_logprobs[phrase] = mean_logprob
-                
-            except Exception as e:
-                print(f"✗ Error getting logprobs for '{phrase}': {str(e)}")
+        print("\n📊 Calculating logprobs for uncertainty phrases...")
+        # Each phrase needs its own completion for clean per-phrase logprobs,
+        # so the queries are sent concurrently rather than merged into one
+        mean_logprobs = await asyncio.gather(*[
+            self._get_phrase_logprob(phrase) for phrase in missing
+        ])
+        fetched = time.monotonic()
+        for phrase, mean_logprob in zip(missing, mean_logprobs):
+            if mean_logprob is None:
                 phrase_logprobs[phrase] = 0.0
+            else:
+                phrase_logprobs[phrase] = mean_logprob
+                self._phrase_logprob_cache[(self.model, phrase)] = (fetched, mean_logprob)
         
+        return {phrase: phrase_logprobs[phrase] for phrase in phrases}
+    
+    def _cached_phrase_logprobs(
+        self,
+        phrases: Tuple[str, ...],
+        max_age: Optional[float] = None
+    ) -> Dict[str, float]:
+        """
+        Look up the phrases whose cached logprob is recent enough.
+        
+        Args:
+            phrases: Phrases to look up
+            max_age: Maximum age in seconds (defaults to ``baseline_ttl``)
+            
+        Returns:
+            Dictionary mapping the cached phrases to their mean logprobs
+        """
+        if max_age is None:
+            max_age = self.baseline_ttl
+        now = time.monotonic()
+        phrase_logprobs: Dict[str, float] = {}
+        for phrase in phrases:
+            cached = self._phrase_logprob_cache.get((self.model, phrase))
+            if cached is not None and now - cached[0] < max_age:
+                phrase_logprobs[phrase] = cached[1]
         return phrase_logprobs
     
-    def _generate_uncertainty_message(self, prompt: str, responses: List[str]) -> str:
+    def _clear_of_threshold(
+        self,
+        answer_mean_logprob: float,
+        phrase_logprobs: Dict[str, float],
+        uncertainty_threshold: float
+    ) -> bool:
+        """
+        Check whether a baseline gives a certainty ratio far from the threshold.
+        
+        The phrase logprobs drift little between refreshes, so a ratio more than
+        ``_FAST_PATH_MARGIN`` times away from the threshold would not flip with
+        fresh values.
+        
+        Args:
+            answer_mean_logprob: Mean logprob of the answers
+            phrase_logprobs: Uncertainty-phrase baseline to compare against
+            uncertainty_threshold: Threshold for ratio comparison
+            
+        Returns:
+            True if the uncertainty decision is clear-cut with this baseline
+        """
+        phrase_mean = statistics.fmean(phrase_logprobs.values())
+        if phrase_mean == 0 or uncertainty_threshold <= 0:
+            return False
+        certainty_ratio = answer_mean_logprob / phrase_mean
+        return (
+            certainty_ratio < uncertainty_threshold / _FAST_PATH_MARGIN
+            or certainty_ratio > uncertainty_threshold * _FAST_PATH_MARGIN
+        )
+    
+    def _phrase_request(self, phrase: str) -> Dict[str, Any]:
+        """Return the chat completion arguments that probe one uncertainty phrase."""
+        request = self._phrase_requests.get(phrase)
+        if request is None:
+            request = self._phrase_requests[phrase] = {
+                "model": self.model,
+                "messages": [{"role": "user", "content": "Complete this sentence: " + phrase}],
+                "temperature": 0.0,
+                "max_tokens": 10,
+                "logprobs": True
+            }
+        return request
+    
+    async def _get_phrase_logprob(self, phrase: str) -> Optional[float]:
+        """
+        Get the mean logprob for a specific phrase by querying the LLM.
+        
+        Args:
+            phrase: Phrase to get logprobs for
+            
+        Returns:
+            Mean logprob of the completion, or None on error
+        """
+        try:
+            # Query the LLM with just the phrase. Only the token logprobs are
+            # used, so the raw body is decoded instead of building SDK models.
+            body = await self._retrying()(
+                self._create_raw_completion_once, **self._phrase_request(phrase)
+            )
+            
+            logprobs_data = LogprobStream.from_json(orjson.loads(body)["choices"][0].get("logprobs"))
+            return self._calculate_mean_logprob([logprobs_data])
+            
+        except Exception as e:
+            print(f"✗ Error getting logprobs for '{phrase}': {str(e)}")
+            return None
+    
+    async def _generate_uncertainty_message(self, prompt: str, responses: List[str]) -> str:
         """
         Generate an "I'm unsure about..." message when LLM is uncertain.
         
         Args:
             prompt: The original user prompt
-            responses: List of responses from the LLM
+            responses: Texts of the successful samples (no None entries)
             
         Returns:
             A message explaining what the LLM is unsure about
         """
         try:
-            # Get valid responses
-            valid_responses = [r for r in responses if r is not None]
             context = ""
-            if valid_responses:
+            if responses:
                 # Use first response as context
-                context = f"\n\nContext: {valid_responses[0][:200]}"
+                context = f"\n\nContext: {responses[0][:200]}"
             
             # Ask LLM to explain what it's unsure about
-            completion = self.client.chat.completions.create(
+            completion = await self._create_completion(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are helping to identify uncertainty. Complete the following statement about what aspects of the question are unclear or require more information."},
@@ -324,6 +1377,26 @@ class UncertaintyMeasurer:
             print(f"✗ Error generating uncertainty message: {str(e)}")
             return "I'm unsure about how to answer this question accurately. Could you please provide more information or clarify your question?"
     
+    def results_to_json(self, results: Dict[str, Any]) -> str:
+        """
+        Serialize measurement results to indented JSON.
+        
+        The raw ``logprobs`` objects are left out; NumPy values are serialized
+        natively and non-finite floats (e.g. an infinite certainty ratio)
+        become ``null`` so the output is always valid JSON.
+        
+        Args:
+            results: Results dictionary from measure_uncertainty
+            
+        Returns:
+            JSON string
+        """
+        payload = {key: value for key, value in results.items() if key != "logprobs"}
+        return orjson.dumps(
+            payload,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2
+        ).decode("utf-8")
+    
     def format_results(self, results: Dict[str, Any]) -> str:
         """
         Format the uncertainty measurement results for display.
@@ -334,45 +1407,51 @@ class UncertaintyMeasurer:
         Returns:
             Formatted string representation
         """
-        output = []
-        output.append("=" * 80)
-        output.append("UNCERTAINTY MEASUREMENT RESULTS")
-        output.append("=" * 80)
-        output.append(f"\nPrompt: {results['prompt']}")
-        output.append(f"\nNumber of samples: {results['num_samples']}")
-        
         analysis = results['uncertainty_analysis']
+        # Truncate long responses once, up front
+        shown = [
+            (i, f"{response[:200]}..." if len(response) > 200 else response)
+            for i, response in enumerate(results['responses'], 1)
+            if response is not None
+        ]
+        
+        buf = io.StringIO()
+        w = buf.write
+        w(_HR + "\n")
+        w("UNCERTAINTY MEASUREMENT RESULTS\n")
+        w(_HR + "\n")
+        w(f"\nPrompt: {results['prompt']}\n")
+        w(f"\nNumber of samples: {results['num_samples']}\n")
         
-        output.append("\n" + "-" * 80)
-        output.append("UNCERTAINTY ANALYSIS")
-        output.append("-" * 80)
+        w("\n" + _HR2 + "\n")
+        w("UNCERTAINTY ANALYSIS\n")
+        w(_HR2 + "\n")
         
         if 'error' in analysis:
-            output.append(f"\nError: {analysis['error']}")
+            w(f"\nError: {analysis['error']}\n")
         else:
-            output.append(f"\nUncertainty Level: {analysis['uncertainty_level'].upper()}")
-            output.append(f"Response Diversity: {analysis['response_diversity']} ({analysis['unique_responses']}/{analysis['total_samples']} unique)")
-            output.append(f"Average Token Confidence: {analysis['average_token_confidence']}")
+            w(f"\nUncertainty Level: {analysis['uncertainty_level'].upper()}\n")
+            w(f"Response Diversity: {analysis['response_diversity']} ({analysis['unique_responses']}/{analysis['total_samples']} unique)\n")
+            w(f"Average Token Confidence: {analysis['average_token_confidence']}\n")
             
             # Add new ratio analysis
             if 'certainty_ratio' in analysis:
-                output.append(f"\nAnswer Mean Logprob: {analysis['answer_mean_logprob']}")
-                output.append(f"Uncertainty Phrases Mean Logprob: {analysis['uncertainty_phrase_mean_logprob']}")
-                output.append(f"Certainty Ratio: {analysis['certainty_ratio']}")
-                output.append(f"Threshold: {analysis['uncertainty_threshold']}")
-                output.append(f"Status: {'UNCERTAIN - Needs clarification' if analysis['is_uncertain'] else 'CONFIDENT - Has answer'}")
+                w(f"\nAnswer Mean Logprob: {analysis['answer_mean_logprob']}\n")
+                w(f"Uncertainty Phrases Mean Logprob: {analysis['uncertainty_phrase_mean_logprob']}\n")
+                w(f"Certainty Ratio: {analysis['certainty_ratio']}\n")
+                w(f"Threshold: {analysis['uncertainty_threshold']}\n")
+                w(f"Status: {'UNCERTAIN - Needs clarification' if analysis['is_uncertain'] else 'CONFIDENT - Has answer'}\n")
             
-            output.append(f"\nRecommendation: {analysis['recommendation']}")
+            w(f"\nRecommendation: {analysis['recommendation']}\n")
         
-        output.append("\n" + "-" * 80)
-        output.append("INDIVIDUAL RESPONSES")
-        output.append("-" * 80)
+        w("\n" + _HR2 + "\n")
+        w("INDIVIDUAL RESPONSES\n")
+        w(_HR2 + "\n")
         
-        for i, response in enumerate(results['responses'], 1):
-            if response is not None:
-                output.append(f"\nResponse {i}:")
-                output.append(f"{response[:200]}..." if len(response) > 200 else response)
+        for i, response in shown:
+            w(f"\nResponse {i}:\n")
+            w(f"{response}\n")
         
-        output.append("\n" + "=" * 80)
+        w("\n" + _HR)
         
-        return "\n".join(output)
+        return buf.getvalue()
@@ -0,0 +1,113 @@
+"""
+Semantic Uncertainty Cache
+
+This module implements a cache of uncertainty results keyed by prompt
+embeddings, so paraphrases of an already measured question ("capital of
+France?" vs "What is France's capital") reuse the earlier measurement. One
+embedding request replaces the whole set of sampling requests on a hit.
+"""
+
+from typing import Any, Dict, Hashable, List, Optional
+import numpy as np
+
+
+class SemanticUncertaintyCache:
+    """
+    A fixed-size cache of uncertainty results looked up by cosine similarity
+    of prompt embeddings.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        model: str = "text-embedding-3-small",
+        threshold: float = 0.92,
+        max_entries: int = 256
+    ):
+        """
+        Initialize the SemanticUncertaintyCache.
+
+        Args:
+            client: AsyncOpenAI client used for the embedding requests
+            model: Embedding model
+            threshold: Minimum cosine similarity for a prompt to count as a hit
+            max_entries: Number of results to keep; the oldest is replaced first
+        """
+        self.client = client
+        self.model = model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # Unit-length embeddings, one row per entry, so cosine similarity is
+        # a single matrix-vector product. Allocated on the first insert, once
+        # the embedding size is known.
+        self.keys: Optional[np.ndarray] = None
+        self.values: List[Dict[str, Any]] = []
+        self._params: List[Hashable] = []
+        self._next = 0
+
+    async def aembed(self, prompt: str) -> Optional[np.ndarray]:
+        """
+        Embed a prompt for ``lookup`` and ``add``.
+
+        Args:
+            prompt: The prompt to embed
+
+        Returns:
+            L2-normalized embedding, or None if the request failed
+        """
+        try:
+            response = await self.client.embeddings.create(model=self.model, input=prompt)
+        except Exception as e:
+            print(f"✗ Error embedding prompt for the semantic cache: {str(e)}")
+            return None
+
+        embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def lookup(self, embedding: np.ndarray, params: Hashable = None) -> Optional[Dict[str, Any]]:
+        """
+        Find the cached result for the most similar prompt.
+
+        Args:
+            embedding: Normalized prompt embedding from ``aembed``
+            params: Measurement parameters the cached result must have been
+                produced with (e.g. sample count and threshold)
+
+        Returns:
+            The cached uncertainty results, or None on a miss
+        """
+        if not self.values:
+            return None
+
+        sims = self.keys[:len(self.values)] @ embedding
+        # Best match first; entries measured with other parameters do not count
+        for index in np.argsort(-sims):
+            if sims[index] < self.threshold:
+                break
+            if self._params[index] == params:
+                return self.values[index]
+        return None
+
+    def add(self, embedding: np.ndarray, results: Dict[str, Any], params: Hashable = None):
+        """
+        Store uncertainty results for a prompt.
+
+        Args:
+            embedding: Normalized prompt embedding from ``aembed``
+            results: Uncertainty results for the prompt
+            params: Measurement parameters the results were produced with
+        """
+        if self.max_entries <= 0:
+            return
+        if self.keys is None:
+            self.keys = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+
+        self.keys[self._next] = embedding
+        if self._next < len(self.values):
+            self.values[self._next] = results
+            self._params[self._next] = params
+        else:
+            self.values.append(results)
+            self._params.append(params)
+        self._next = (self._next + 1) % self.max_entries
@@ -4,51 +4,179 @@ Unit tests for the measure_uncertainty module.
 These tests verify the core logic without requiring API calls.
 """
 
+import asyncio
+import json
+import math
 import unittest
-from unittest.mock import Mock, MagicMock, patch
-from src.measure_uncertainty import UncertaintyMeasurer
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
+import numpy as np
+from openai import APITimeoutError, InternalServerError
+from tenacity import wait_none
+from src.measure_uncertainty import LogprobStream, UncertaintyMeasurer
+
+
+def create_batch_output_line(custom_id, text, logprob=-0.1):
+    """Create one line of a Batch API output file."""
+    return json.dumps({
+        "custom_id": custom_id,
+        "response": {
+            "status_code": 200,
+            "body": {
+                "id": custom_id,
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4",
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": text},
+                    "logprobs": {"content": [
+                        {"token": word, "logprob": logprob, "bytes": None, "top_logprobs": []}
+                        for word in text.split()
+                    ]}
+                }]
+            }
+        },
+        "error": None
+    })
+
+
+class MockStream:
+    """
+    Async iterator over streamed chunks that records whether it was closed.
+    
+    An exception among the chunks is raised when reached, like a dropped
+    connection.
+    """
+    
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.consumed = 0
+        self.closed = False
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        await asyncio.sleep(0)  # Let other tasks run between chunks, as on a network
+        if self.consumed == len(self.chunks):
+            raise StopAsyncIteration
+        self.consumed += 1
+        chunk = self.chunks[self.consumed - 1]
+        if isinstance(chunk, Exception):
+            raise chunk
+        return chunk
+    
+    async def close(self):
+        self.closed = True
+
+
+def create_logprob_stream(logprobs):
+    """Create a logprob stream with one placeholder token per logprob."""
+    return LogprobStream(tokens=["x"] * len(logprobs), logprobs=np.array(logprobs, dtype=np.float32))
+
+
+def create_mock_chunk(word, logprob):
+    """Create a streamed chunk carrying one token."""
+    choice = Mock()
+    choice.delta.content = word
+    choice.logprobs.content = [Mock(logprob=logprob)]
+    return Mock(choices=[choice])
+
+
+def create_mock_completion(text, logprob=-0.1):
+    """Create a mock chat completion with one token per word."""
+    mock_choice = Mock()
+    mock_choice.message.content = text
+    mock_choice.logprobs.content = [Mock(logprob=logprob) for _ in text.split()]
+    return Mock(choices=[mock_choice])
+
+
+def create_mock_client():
+    """
+    Create a mock AsyncOpenAI client for the measurer.
+    
+    Phrase probes go through ``with_raw_response``; they are answered by
+    ``chat.completions.create`` (so tests set up one side effect for all
+    requests) and returned as a raw JSON body.
+    """
+    client = Mock()
+    
+    async def raw_create(**kwargs):
+        completion = await client.chat.completions.create(**kwargs)
+        tokens = [
+            {"token": "x", "logprob": token.logprob}
+            for token in completion.choices[0].logprobs.content
+        ]
+        body = {"choices": [{"logprobs": {"content": tokens}}]}
+        return Mock(content=json.dumps(body).encode("utf-8"))
+    
+    client.chat.completions.with_raw_response.create = raw_create
+    return client
+
+
+def is_phrase_probe(request):
+    """Tell an uncertainty-phrase baseline query from a sample request."""
+    return request["messages"][-1]["content"].startswith("Complete this sentence: ")
 
 
 class TestUncertaintyMeasurer(unittest.TestCase):
     """Test cases for UncertaintyMeasurer class."""
     
+    @classmethod
+    def setUpClass(cls):
+        """Build the read-only mock API objects shared by the tests once."""
+        cls.MOCK_LP_0_1 = cls._build_mock_lp(-0.1, n=5)
+        cls.MOCK_LP_0_5 = cls._build_mock_lp(-0.5, n=5)
+        cls.PARIS_COMPLETION = create_mock_completion("Paris", logprob=-0.1)
+        cls.PHRASE_COMPLETION = create_mock_completion("I'm not sure", logprob=-0.05)
+    
+    @staticmethod
+    def _build_mock_lp(logprob, n=5):
+        """Create a mock ``ChoiceLogprobs`` with n tokens of the same logprob."""
+        return Mock(content=[Mock(logprob=logprob) for _ in range(n)])
+    
     def setUp(self):
         """Set up test fixtures."""
         self.api_key = "test-api-key"
         self.model = "gpt-4"
+        UncertaintyMeasurer.clear_baseline_cache()
     
-    @patch('src.measure_uncertainty.OpenAI')
+    @patch('src.measure_uncertainty.get_async_client')
     def test_initialization(self, mock_openai):
         """Test UncertaintyMeasurer initialization."""
         measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
         
         self.assertEqual(measurer.api_key, self.api_key)
         self.assertEqual(measurer.model, self.model)
+        self.assertIs(measurer.client, mock_openai.return_value)
         mock_openai.assert_called_once_with(api_key=self.api_key)
     
     def test_calculate_average_confidence(self):
         """Test calculation of average confidence from logprobs."""
         measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
         
-        # Create mock logprobs data
-        mock_logprobs = []
-        for _ in range(3):
-            mock_content = []
-            for _ in range(5):  # 5 tokens
-                token_logprob = Mock()
-                token_logprob.logprob = -0.1  # High confidence (close to 0)
-                mock_content.append(token_logprob)
-            
-            mock_lp = Mock()
-            mock_lp.content = mock_content
-            mock_logprobs.append(mock_lp)
+        # Three responses of 5 tokens each, with high confidence (close to 0)
+        mock_logprobs = [self.MOCK_LP_0_1] * 3
         
-        confidence = measurer._calculate_average_confidence(mock_logprobs)
+        streams = [LogprobStream.from_logprobs(lp) for lp in mock_logprobs]
+        confidence = measurer._calculate_average_confidence(streams)
         
         # Confidence should be high (close to 1) since logprob is close to 0
         self.assertGreater(confidence, 0.9)
         self.assertLessEqual(confidence, 1.0)
     
+    def test_calculate_average_confidence_uses_natural_log(self):
+        """Test that token logprobs are converted to probabilities with base e."""
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        streams = [create_logprob_stream([-0.1, -1.0]), None, create_logprob_stream([-2.5])]
+        
+        confidence = measurer._calculate_average_confidence(streams)
+        
+        expected = (math.exp(-0.1) + math.exp(-1.0) + math.exp(-2.5)) / 3
+        self.assertAlmostEqual(confidence, expected, places=6)
+    
     def test_calculate_average_confidence_empty(self):
         """Test average confidence calculation with empty data."""
         measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
@@ -56,6 +184,19 @@ class TestUncertaintyMeasurer(unittest.TestCase):
         confidence = measurer._calculate_average_confidence([])
         self.assertEqual(confidence, 0.0)
     
+    def test_summarize_logprobs(self):
+        """Test that the fused pass matches the separate statistics."""
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        streams = [create_logprob_stream([-0.1, -0.5]), None, create_logprob_stream([-1.0])]
+        
+        mean_logprob, confidence, total_tokens = measurer._summarize_logprobs(streams)
+        
+        self.assertAlmostEqual(mean_logprob, measurer._calculate_mean_logprob(streams), places=6)
+        self.assertAlmostEqual(confidence, measurer._calculate_average_confidence(streams), places=6)
+        self.assertAlmostEqual(confidence, (math.exp(-0.1) + math.exp(-0.5) + math.exp(-1.0)) / 3, places=6)
+        self.assertEqual(total_tokens, 3)
+        self.assertEqual(measurer._summarize_logprobs([None]), (0.0, 0.0, 0))
+    
     def test_analyze_uncertainty_low(self):
         """Test uncertainty analysis with low diversity (confident responses)."""
         measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
@@ -64,7 +205,7 @@ class TestUncertaintyMeasurer(unittest.TestCase):
         responses = ["Paris"] * 5
         
         # Mock logprobs
-        mock_logprobs = [Mock(content=[Mock(logprob=-0.1)]) for _ in range(5)]
+        mock_logprobs = [create_logprob_stream([-0.1]) for _ in range(5)]
         
         analysis = measurer._analyze_uncertainty(responses, mock_logprobs)
         
@@ -81,7 +222,7 @@ class TestUncertaintyMeasurer(unittest.TestCase):
         responses = [f"Response {i}" for i in range(5)]
         
         # Mock logprobs
-        mock_logprobs = [Mock(content=[Mock(logprob=-1.0)]) for _ in range(5)]
+        mock_logprobs = [create_logprob_stream([-1.0]) for _ in range(5)]
         
         analysis = measurer._analyze_uncertainty(responses, mock_logprobs)
         
@@ -98,7 +239,7 @@ class TestUncertaintyMeasurer(unittest.TestCase):
         responses = ["Answer A", "Answer A", "Answer B", "Answer C", "Answer A"]
         
         # Mock logprobs
-        mock_logprobs = [Mock(content=[Mock(logprob=-0.5)]) for _ in range(5)]
+        mock_logprobs = [create_logprob_stream([-0.5]) for _ in range(5)]
         
         analysis = measurer._analyze_uncertainty(responses, mock_logprobs)
         
@@ -106,17 +247,47 @@ class TestUncertaintyMeasurer(unittest.TestCase):
         self.assertEqual(analysis["total_samples"], 5)
         self.assertEqual(analysis["uncertainty_level"], "medium")
     
+    def test_analyze_uncertainty_paraphrases(self):
+        """Test that reworded versions of the same answer count once."""
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        responses = [
+            "Paris is the capital of France.",
+            "The capital of France is Paris.",
+            "paris is the capital of france",
+            "Lyon."
+        ]
+        mock_logprobs = [create_logprob_stream([-0.1]) for _ in range(4)]
+        
+        analysis = measurer._analyze_uncertainty(responses, mock_logprobs)
+        
+        self.assertEqual(analysis["unique_responses"], 2)
+        self.assertEqual(analysis["total_samples"], 4)
+    
+    def test_analyze_uncertainty_ignores_formatting(self):
+        """Test that case, spacing and final punctuation do not count as diversity."""
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        responses = ["Paris.", "Paris", "paris!", "  PARIS  "]
+        
+        analysis = measurer._analyze_uncertainty(responses, [create_logprob_stream([-0.1])] * 4)
+        
+        self.assertEqual(analysis["unique_responses"], 1)
+    
     def test_analyze_uncertainty_with_none_responses(self):
         """Test uncertainty analysis when some responses are None."""
         measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
         
         # Some responses failed (None)
         responses = ["Answer A", None, "Answer A", None, "Answer B"]
-        mock_logprobs = [Mock(content=[Mock(logprob=-0.1)]), None, 
-                         Mock(content=[Mock(logprob=-0.1)]), None,
-                         Mock(content=[Mock(logprob=-0.1)])]
+        mock_logprobs = [create_logprob_stream([-0.1]), None, 
+                         create_logprob_stream([-0.1]), None,
+                         create_logprob_stream([-0.1])]
         
-        analysis = measurer._analyze_uncertainty(responses, mock_logprobs)
+        results = asyncio.run(measurer._build_results(
+            "Question", 5, responses, mock_logprobs, 0.01, {"I'm not sure": -2.0}
+        ))
+        analysis = results["uncertainty_analysis"]
         
         self.assertEqual(analysis["total_samples"], 3)  # Only valid responses
         self.assertEqual(analysis["unique_responses"], 2)
@@ -125,10 +296,7 @@ class TestUncertaintyMeasurer(unittest.TestCase):
         """Test uncertainty analysis when all responses failed."""
         measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
         
-        responses = [None, None, None]
-        mock_logprobs = [None, None, None]
-        
-        analysis = measurer._analyze_uncertainty(responses, mock_logprobs)
+        analysis = measurer._analyze_uncertainty([], [None, None, None])
         
         self.assertIn("error", analysis)
         self.assertEqual(analysis["uncertainty_level"], "unknown")
@@ -160,41 +328,619 @@ class TestUncertaintyMeasurer(unittest.TestCase):
         self.assertIn("HIGH", formatted_upper)
         self.assertIn("RESPONSE 1", formatted_upper)
     
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_streamed_sample_stops_on_plateau(self, mock_openai):
+        """Test that a streamed sample is cut off once its logprobs settle."""
+        stream = MockStream(create_mock_chunk(f"w{i} ", -0.01) for i in range(50))
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(return_value=stream)
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, stream_plateau_eps=0.05, stream_min_tokens=5)
+        
+        text, logprobs = asyncio.run(measurer._one_sample("Capital of France?", 0, 1, 0.7, 500))
+        
+        self.assertEqual(stream.consumed, 5)
+        self.assertTrue(stream.closed)
+        self.assertEqual(text, "w0 w1 w2 w3 w4 ")
+        self.assertEqual(len(logprobs.tokens), 5)
+        self.assertTrue(mock_client.chat.completions.create.await_args.kwargs["stream"])
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_streamed_sample_reads_varying_logprobs(self, mock_openai):
+        """Test that a streamed sample keeps reading while logprobs vary."""
+        stream = MockStream(create_mock_chunk("w ", -0.01 if i % 2 else -3.0) for i in range(8))
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(return_value=stream)
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, stream_plateau_eps=0.05)
+        
+        text, logprobs = asyncio.run(measurer._one_sample("Capital of France?", 0, 1, 0.7, 500))
+        
+        self.assertEqual(stream.consumed, 8)
+        self.assertEqual(len(logprobs.tokens), 8)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_measure_uncertainty_batch(self, mock_openai):
+        """Test that batch output rows are grouped back per prompt."""
+        mock_client = create_mock_client()
+        mock_client.files.create = AsyncMock(return_value=Mock(id="file-1"))
+        mock_client.batches.create = AsyncMock(return_value=Mock(id="batch-1", status="validating"))
+        mock_client.batches.retrieve = AsyncMock(return_value=Mock(
+            id="batch-1", status="completed", output_file_id="file-2"
+        ))
+        mock_client.files.content = AsyncMock(return_value=Mock(text="\n".join([
+            create_batch_output_line("1:sample:1", "Python"),
+            create_batch_output_line("0:sample:0", "4"),
+            create_batch_output_line("1:sample:0", "Rust"),
+            create_batch_output_line("0:sample:1", "4"),
+            create_batch_output_line("phrase:0", "sure", logprob=-2.0),
+            create_batch_output_line("phrase:1", "insecure", logprob=-2.0),
+            create_batch_output_line("phrase:2", "help", logprob=-2.0)
+        ])))
+        mock_client.chat.completions.create = AsyncMock(
+            return_value=create_mock_completion("I'm not sure", logprob=-0.01)
+        )
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        results = measurer.measure_uncertainty_batch(
+            ["What is 2 + 2?", "Best language?"], num_samples=2, poll_interval=0,
+            uncertainty_threshold=0.01
+        )
+        
+        self.assertEqual([r["prompt"] for r in results], ["What is 2 + 2?", "Best language?"])
+        self.assertEqual(results[0]["responses"], ["4", "4"])
+        self.assertEqual(results[1]["responses"], ["Rust", "Python"])
+        self.assertEqual(results[0]["uncertainty_analysis"]["uncertainty_phrase_mean_logprob"], -2.0)
+        uploaded = mock_client.files.create.await_args.kwargs["file"][1].decode("utf-8").splitlines()
+        self.assertEqual(len(uploaded), 7)
+        self.assertEqual(json.loads(uploaded[0])["custom_id"], "0:sample:0")
+        self.assertEqual(json.loads(uploaded[4])["custom_id"], "phrase:0")
+        # The uncertainty phrases came back in the batch, not as regular requests
+        self.assertEqual(mock_client.chat.completions.create.await_count, 0)
+    
+    @patch('src.measure_uncertainty.asyncio.sleep', new_callable=AsyncMock)
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_use_batch_polls_with_backoff(self, mock_openai, mock_sleep):
+        """Test that use_batch routes through the Batch API and backs off between polls."""
+        mock_client = create_mock_client()
+        mock_client.files.create = AsyncMock(return_value=Mock(id="file-1"))
+        mock_client.batches.create = AsyncMock(return_value=Mock(id="batch-1", status="validating"))
+        mock_client.batches.retrieve = AsyncMock(side_effect=[
+            Mock(id="batch-1", status="in_progress"),
+            Mock(id="batch-1", status="in_progress"),
+            Mock(id="batch-1", status="completed", output_file_id="file-2")
+        ])
+        mock_client.files.content = AsyncMock(return_value=Mock(text="\n".join([
+            create_batch_output_line("0:sample:0", "4"),
+            create_batch_output_line("0:sample:1", "4")
+        ])))
+        mock_client.chat.completions.create = AsyncMock(
+            return_value=create_mock_completion("I'm not sure", logprob=-0.01)
+        )
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        results = measurer.measure_uncertainty("What is 2 + 2?", num_samples=2, use_batch=True)
+        
+        self.assertEqual(results["responses"], ["4", "4"])
+        self.assertEqual([call.args[0] for call in mock_sleep.await_args_list], [30.0, 60.0, 120.0])
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_measure_uncertainty_batch_failed(self, mock_openai):
+        """Test that a failed batch raises instead of returning empty results."""
+        mock_client = create_mock_client()
+        mock_client.files.create = AsyncMock(return_value=Mock(id="file-1"))
+        mock_client.batches.create = AsyncMock(return_value=Mock(id="batch-1", status="validating"))
+        mock_client.batches.retrieve = AsyncMock(return_value=Mock(id="batch-1", status="failed"))
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        job = measurer.submit_batch(["What is 2 + 2?"], num_samples=1)
+        self.assertEqual(job.batch_id, "batch-1")
+        
+        with self.assertRaises(RuntimeError):
+            measurer.await_batch(job, poll_interval=0)
+    
+    def test_results_to_json(self):
+        """Test JSON serialization of results."""
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        results = {
+            "prompt": "Test prompt",
+            "responses": ["Response 1", None],
+            "logprobs": [Mock(), None],
+            "uncertainty_analysis": {
+                "certainty_ratio": float("inf"),
+                "average_token_confidence": np.float64(0.5)
+            }
+        }
+        
+        decoded = json.loads(measurer.results_to_json(results))
+        
+        self.assertNotIn("logprobs", decoded)
+        self.assertEqual(decoded["responses"], ["Response 1", None])
+        self.assertIsNone(decoded["uncertainty_analysis"]["certainty_ratio"])
+        self.assertEqual(decoded["uncertainty_analysis"]["average_token_confidence"], 0.5)
+    
     def test_calculate_mean_logprob(self):
         """Test calculation of mean log probability."""
         measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
         
-        # Create mock logprobs data
-        mock_logprobs = []
-        for _ in range(3):
-            mock_content = []
-            for _ in range(5):  # 5 tokens
-                token_logprob = Mock()
-                token_logprob.logprob = -0.5
-                mock_content.append(token_logprob)
-            
-            mock_lp = Mock()
-            mock_lp.content = mock_content
-            mock_logprobs.append(mock_lp)
+        # Three responses of 5 tokens each
+        mock_logprobs = [self.MOCK_LP_0_5] * 3
         
-        mean_logprob = measurer._calculate_mean_logprob(mock_logprobs)
+        streams = [LogprobStream.from_logprobs(lp) for lp in mock_logprobs]
+        mean_logprob = measurer._calculate_mean_logprob(streams)
         
         # Mean should be -0.5
         self.assertAlmostEqual(mean_logprob, -0.5, places=5)
     
+    def test_calculate_mean_logprob_skips_missing_values(self):
+        """Test that None logprobs and None responses are ignored."""
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        streams = [
+            LogprobStream.from_logprobs(
+                Mock(content=[Mock(logprob=-1.0), Mock(logprob=None), Mock(logprob=-3.0)])
+            ),
+            None,
+            LogprobStream.from_logprobs(Mock(content=[]))
+        ]
+        
+        mean_logprob = measurer._calculate_mean_logprob(streams)
+        
+        self.assertAlmostEqual(mean_logprob, -2.0, places=5)
+        self.assertIsInstance(mean_logprob, float)
+    
+    def test_logprob_stream_from_raw_json(self):
+        """Test that a raw response's logprobs convert like the SDK objects."""
+        stream = LogprobStream.from_json({"content": [
+            {"token": "I", "logprob": -1.0},
+            {"token": "'m", "logprob": None},
+            {"token": " sure", "logprob": -3.0}
+        ]})
+        
+        self.assertEqual(stream.tokens, ["I", " sure"])
+        np.testing.assert_allclose(stream.logprobs, [-1.0, -3.0])
+        self.assertEqual(len(LogprobStream.from_json(None).logprobs), 0)
+    
     def test_calculate_mean_logprob_empty(self):
         """Test mean logprob calculation with empty data."""
         measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
         
         mean_logprob = measurer._calculate_mean_logprob([])
         self.assertEqual(mean_logprob, 0.0)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_ameasure_uncertainty(self, mock_openai):
+        """Test that all samples are collected by the async implementation."""
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(
+            side_effect=[self.PARIS_COMPLETION] * 3 + [self.PHRASE_COMPLETION] * 3
+        )
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        results = asyncio.run(measurer.ameasure_uncertainty("Capital of France?", num_samples=3))
+        
+        self.assertEqual(results["responses"], ["Paris"] * 3)
+        self.assertFalse(results["is_uncertain"])
+        self.assertEqual(results["tool_response"], "Paris")
+        self.assertEqual(mock_client.chat.completions.create.await_count, 6)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_measure_uncertainty_sync_wrapper(self, mock_openai):
+        """Test that the sync wrapper runs the async implementation."""
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(side_effect=[
+            self.PARIS_COMPLETION,
+            RuntimeError("boom")
+        ] + [self.PHRASE_COMPLETION] * 3)
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        results = measurer.measure_uncertainty("Capital of France?", num_samples=2)
+        
+        self.assertEqual(results["responses"], ["Paris", None])
+        self.assertEqual(results["uncertainty_analysis"]["total_samples"], 1)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_deterministic_samples_are_cached(self, mock_openai):
+        """Test that temperature 0 samples are reused and others are not."""
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(
+            return_value=create_mock_completion("Paris", logprob=-0.01)
+        )
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        first = measurer.measure_uncertainty("Capital of France?", num_samples=3, temperature=0.0)
+        calls_after_first = mock_client.chat.completions.create.await_count
+        second = measurer.measure_uncertainty("Capital of France?", num_samples=3, temperature=0.0)
+        
+        self.assertEqual(mock_client.chat.completions.create.await_count, calls_after_first)
+        self.assertEqual(second["responses"], first["responses"])
+        
+        measurer.measure_uncertainty("Capital of France?", num_samples=3, temperature=0.7)
+        measurer.measure_uncertainty("Capital of France?", num_samples=3, temperature=0.7)
+        self.assertEqual(mock_client.chat.completions.create.await_count, calls_after_first + 6)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_identical_responses_are_interned(self, mock_openai):
+        """Test that textually identical samples share one string object."""
+        mock_client = create_mock_client()
+        # A fresh string per call, as decoded from separate API responses
+        mock_client.chat.completions.create = AsyncMock(
+            side_effect=lambda **kwargs: create_mock_completion("".join(["Par", "is"]), logprob=-0.01)
+        )
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, model=self.model)
+        
+        results = measurer.measure_uncertainty("Capital of France?", num_samples=3)
+        
+        self.assertEqual(results["responses"], ["Paris"] * 3)
+        self.assertIs(results["responses"][0], results["responses"][1])
+        self.assertIs(results["responses"][1], results["responses"][2])
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_sample_cache_uses_given_backend(self, mock_openai):
+        """Test that cached samples go through a caller-supplied backend."""
+        class DictBackend:
+            def __init__(self):
+                self.entries = {}
+            
+            def get(self, key):
+                return self.entries.get(key)
+            
+            def set(self, key, value):
+                self.entries[key] = value
+        
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(
+            return_value=create_mock_completion("Paris", logprob=-0.01)
+        )
+        mock_openai.return_value = mock_client
+        backend = DictBackend()
+        
+        UncertaintyMeasurer(api_key=self.api_key, cache_backend=backend).measure_uncertainty(
+            "Capital of France?", num_samples=2, temperature=0.0
+        )
+        calls_after_first = mock_client.chat.completions.create.await_count
+        # A new measurer sharing the backend (e.g. the next run) reuses the samples
+        results = UncertaintyMeasurer(api_key=self.api_key, cache_backend=backend).measure_uncertainty(
+            "Capital of France?", num_samples=2, temperature=0.0
+        )
+        
+        self.assertEqual(len(backend.entries), 1)
+        self.assertEqual(mock_client.chat.completions.create.await_count, calls_after_first)
+        self.assertEqual(results["responses"], ["Paris", "Paris"])
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_samples_share_identical_prefix(self, mock_openai):
+        """Test that every sample starts with the same system message."""
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(
+            return_value=create_mock_completion("Paris")
+        )
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, system_prompt="Answer briefly.")
+        
+        async def sample_three_times():
+            return await asyncio.gather(*[
+                measurer._one_sample("Capital of France?", i, 3, 0.7, 500) for i in range(3)
+            ])
+        
+        asyncio.run(sample_three_times())
+        
+        sent = [call.kwargs["messages"] for call in mock_client.chat.completions.create.await_args_list]
+        self.assertEqual(sent[0], [
+            {"role": "system", "content": "Answer briefly."},
+            {"role": "user", "content": "Capital of France?"}
+        ])
+        self.assertTrue(all(messages == sent[0] for messages in sent))
+        # Only the sampled tokens' logprobs are needed, not the alternatives
+        kwargs = mock_client.chat.completions.create.await_args.kwargs
+        self.assertTrue(kwargs["logprobs"])
+        self.assertNotIn("top_logprobs", kwargs)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_samples_sent_concurrently_in_order(self, mock_openai):
+        """Test that all samples are in flight at once and keep their order."""
+        in_flight = 0
+        peak = 0
+        delays = {"one": 0.03, "two": 0.01, "three": 0.02}
+        
+        async def fake_create(**kwargs):
+            nonlocal in_flight, peak
+            if is_phrase_probe(kwargs):
+                return create_mock_completion("I'm not sure", logprob=-2.0)
+            in_flight += 1
+            peak = max(peak, in_flight)
+            answer = answers.pop(0)
+            await asyncio.sleep(delays[answer])
+            in_flight -= 1
+            return create_mock_completion(answer)
+        
+        answers = ["one", "two", "three"]
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = fake_create
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key)
+        
+        results = measurer.measure_uncertainty("Count", num_samples=3)
+        
+        self.assertEqual(peak, 3)
+        self.assertEqual(results["responses"], ["one", "two", "three"])
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_baseline_queried_alongside_samples(self, mock_openai):
+        """Test that the phrase queries overlap with the samples."""
+        in_flight = 0
+        peak = 0
+        
+        async def fake_create(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if is_phrase_probe(kwargs):
+                return create_mock_completion("I'm not sure", logprob=-2.0)
+            return create_mock_completion("Paris")
+        
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = fake_create
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key)
+        
+        results = measurer.measure_uncertainty("Capital of France?", num_samples=2)
+        
+        self.assertEqual(peak, 5)
+        self.assertEqual(results["uncertainty_analysis"]["uncertainty_phrase_mean_logprob"], -2.0)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_early_exit_skips_remaining_samples(self, mock_openai):
+        """Test that agreeing samples cancel the ones still waiting to run."""
+        sample_calls = 0
+        
+        async def fake_create(**kwargs):
+            nonlocal sample_calls
+            if is_phrase_probe(kwargs):
+                return create_mock_completion("I'm not sure", logprob=-2.0)
+            sample_calls += 1
+            await asyncio.sleep(0.01)
+            return create_mock_completion("Paris", logprob=-0.01)
+        
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = fake_create
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, max_concurrency=3, early_exit_eps=0.05)
+        
+        results = measurer.measure_uncertainty("Capital of France?", num_samples=9)
+        
+        self.assertLess(sample_calls, 9)
+        self.assertEqual(results["uncertainty_analysis"]["total_samples"], sum(
+            response is not None for response in results["responses"]
+        ))
+        self.assertEqual(results["uncertainty_analysis"]["unique_responses"], 1)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_early_exit_waits_for_disagreeing_samples(self, mock_openai):
+        """Test that differing answers keep every sample."""
+        answers = ["Paris", "Lyon", "Paris", "Nice", "Paris", "Paris"]
+        
+        async def fake_create(**kwargs):
+            if is_phrase_probe(kwargs):
+                return create_mock_completion("I'm not sure", logprob=-2.0)
+            await asyncio.sleep(0)
+            return create_mock_completion(answers.pop(0), logprob=-0.01)
+        
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = fake_create
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, max_concurrency=2, early_exit_eps=0.05)
+        
+        results = measurer.measure_uncertainty("Capital of France?", num_samples=6)
+        
+        self.assertNotIn(None, results["responses"])
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_max_concurrency_limits_in_flight_requests(self, mock_openai):
+        """Test that no more than max_concurrency requests run at once."""
+        in_flight = 0
+        peak = 0
+        
+        async def fake_create(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return create_mock_completion("Paris")
+        
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = fake_create
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, max_concurrency=2)
+        
+        measurer.measure_uncertainty("Capital of France?", num_samples=6)
+        
+        self.assertEqual(peak, 2)
+    
+    @patch('src._client.wait_random_exponential', return_value=wait_none())
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_retries_on_timeout(self, mock_openai, mock_wait):
+        """Test that timed-out and 5xx requests are retried instead of dropped."""
+        timeout = APITimeoutError(request=Mock())
+        server_error = InternalServerError("overloaded", response=Mock(status_code=503), body=None)
+        attempts = [timeout, server_error, create_mock_completion("Paris")]
+        
+        async def fake_create(**kwargs):
+            if is_phrase_probe(kwargs):
+                return self.PHRASE_COMPLETION
+            attempt = attempts.pop(0)
+            if isinstance(attempt, Exception):
+                raise attempt
+            return attempt
+        
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(side_effect=fake_create)
+        mock_openai.return_value = mock_client
+        # Two failures need exactly two retries
+        measurer = UncertaintyMeasurer(api_key=self.api_key, max_retries=2)
+        
+        results = measurer.measure_uncertainty("Capital of France?", num_samples=1)
+        
+        self.assertEqual(results["responses"], ["Paris"])
+        self.assertEqual(mock_client.chat.completions.create.await_count, 6)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_max_retries_zero_makes_one_attempt(self, mock_openai):
+        """Test that max_retries counts retries, so 0 means a single attempt."""
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(
+            side_effect=APITimeoutError(request=Mock())
+        )
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, max_retries=0)
+        
+        with self.assertRaises(APITimeoutError):
+            asyncio.run(measurer._create_completion(model="gpt-4", messages=[]))
+        self.assertEqual(mock_client.chat.completions.create.await_count, 1)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_uncertainty_baseline_is_cached(self, mock_openai):
+        """Test that the uncertainty-phrase baseline is only queried once."""
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(side_effect=[
+            create_mock_completion("Paris"),
+            create_mock_completion("I'm not sure", logprob=-2.0),
+            create_mock_completion("I'm not sure", logprob=-2.0),
+            create_mock_completion("I'm not sure", logprob=-2.0),
+            create_mock_completion("Paris")
+        ])
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key)
+        
+        first = measurer.measure_uncertainty("Capital of France?", num_samples=1, uncertainty_threshold=0.01)
+        second = measurer.measure_uncertainty("Capital of France?", num_samples=1, uncertainty_threshold=0.01)
+        
+        self.assertEqual(mock_client.chat.completions.create.await_count, 5)
+        self.assertEqual(
+            first["uncertainty_analysis"]["uncertainty_phrase_logprobs"],
+            second["uncertainty_analysis"]["uncertainty_phrase_logprobs"]
+        )
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_uncertainty_phrases_queried_concurrently(self, mock_openai):
+        """Test that the uncertainty-phrase queries overlap in time."""
+        in_flight = 0
+        peak = 0
+        
+        async def fake_create(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return create_mock_completion("I'm not sure", logprob=-2.0)
+        
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = fake_create
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key)
+        
+        phrase_logprobs = asyncio.run(measurer._compute_uncertainty_baseline(("a", "b", "c")))
+        
+        self.assertEqual(peak, 3)
+        self.assertEqual(phrase_logprobs, {"a": -2.0, "b": -2.0, "c": -2.0})
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_uncertainty_baseline_expires(self, mock_openai):
+        """Test that the baseline is re-queried once the TTL has passed."""
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(
+            return_value=create_mock_completion("I'm not sure", logprob=-2.0)
+        )
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, baseline_ttl=0.0, fast_path=False)
+        
+        measurer.measure_uncertainty("Capital of France?", num_samples=1, uncertainty_threshold=0.01)
+        measurer.measure_uncertainty("Capital of France?", num_samples=1, uncertainty_threshold=0.01)
+        
+        self.assertEqual(mock_client.chat.completions.create.await_count, 8)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_fast_path_reuses_expired_baseline_when_clear(self, mock_openai):
+        """Test that an expired baseline is only refreshed for close calls."""
+        phrase_calls = 0
+        
+        async def fake_create(**kwargs):
+            nonlocal phrase_calls
+            if is_phrase_probe(kwargs):
+                phrase_calls += 1
+                return create_mock_completion("I'm not sure", logprob=-2.0)
+            return create_mock_completion("Paris", logprob=-0.01)
+        
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = fake_create
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key, baseline_ttl=0.0)
+        
+        # Certainty ratio 0.005: far from a 0.001 threshold, right at 0.005
+        measurer.measure_uncertainty("Capital of France?", num_samples=1, uncertainty_threshold=0.001)
+        self.assertEqual(phrase_calls, 3)
+        clear = measurer.measure_uncertainty("Capital of France?", num_samples=1, uncertainty_threshold=0.001)
+        self.assertEqual(phrase_calls, 3)
+        self.assertFalse(clear["is_uncertain"])
+        measurer.measure_uncertainty("Capital of France?", num_samples=1, uncertainty_threshold=0.005)
+        self.assertEqual(phrase_calls, 6)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_failed_uncertainty_baseline_is_not_cached(self, mock_openai):
+        """Test that only the failed phrase query is repeated."""
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(side_effect=[
+            create_mock_completion("Paris"),
+            RuntimeError("boom"),
+            create_mock_completion("I'm not sure", logprob=-2.0),
+            create_mock_completion("I'm not sure", logprob=-2.0),
+            create_mock_completion("Paris"),
+            create_mock_completion("I'm not sure", logprob=-2.0)
+        ])
+        mock_openai.return_value = mock_client
+        measurer = UncertaintyMeasurer(api_key=self.api_key)
+        
+        first = measurer.measure_uncertainty("Capital of France?", num_samples=1, uncertainty_threshold=0.01)
+        second = measurer.measure_uncertainty("Capital of France?", num_samples=1, uncertainty_threshold=0.01)
+        
+        self.assertEqual(first["uncertainty_analysis"]["uncertainty_phrase_logprobs"]["I'm not sure"], 0.0)
+        self.assertEqual(second["uncertainty_analysis"]["uncertainty_phrase_logprobs"]["I'm not sure"], -2.0)
+        self.assertEqual(mock_client.chat.completions.create.await_count, 6)
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    def test_uncertainty_baseline_shared_across_measurers(self, mock_openai):
+        """Test that a new measurer for the same model reuses the baseline."""
+        mock_client = create_mock_client()
+        mock_client.chat.completions.create = AsyncMock(
+            return_value=create_mock_completion("I'm not sure", logprob=-2.0)
+        )
+        mock_openai.return_value = mock_client
+        
+        asyncio.run(UncertaintyMeasurer(api_key=self.api_key)._compute_uncertainty_baseline(("a", "b")))
+        asyncio.run(UncertaintyMeasurer(api_key=self.api_key)._compute_uncertainty_baseline(("a", "b")))
+        asyncio.run(UncertaintyMeasurer(api_key=self.api_key, model="gpt-4o")._compute_uncertainty_baseline(("a",)))
+        
+        self.assertEqual(mock_client.chat.completions.create.await_count, 3)
 
 
 class TestFunctionSchema(unittest.TestCase):
     """Test the function schema for measure_uncertainty."""
     
-    @patch('src.llm_interface.OpenAI')
-    def test_function_schema_structure(self, mock_openai):
+    @patch('src.measure_uncertainty.get_async_client')
+    @patch('src.llm_interface.get_async_client')
+    def test_function_schema_structure(self, mock_openai, mock_measurer_openai):
         """Test that the function schema is properly structured."""
         from src.llm_interface import LLMFunctionInterface
         
@@ -224,6 +970,476 @@ class TestFunctionSchema(unittest.TestCase):
         self.assertIn("prompt", props)
         self.assertIn("num_samples", props)
         self.assertIn("temperature", props)
+    
+    def test_speculative_params_use_schema_defaults(self):
+        """Test that the measurement started while streaming uses the schema defaults."""
+        from src.llm_interface import MEASURE_UNCERTAINTY_FUNCTION, _measurement_params
+        
+        props = MEASURE_UNCERTAINTY_FUNCTION["function"]["parameters"]["properties"]
+        self.assertEqual(
+            _measurement_params("Capital of France?", {}),
+            ("Capital of France?", props["num_samples"]["default"],
+             props["temperature"]["default"], props["uncertainty_threshold"]["default"])
+        )
+        self.assertEqual(
+            _measurement_params("Capital of France?", {"temperature": 0.2})[2], 0.2
+        )
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    @patch('src.llm_interface.run_in_background')
+    @patch('src.llm_interface.get_async_client')
+    def test_warmup_runs_in_background(self, mock_openai, mock_background, mock_measurer_openai):
+        """Test that the connection warmup is scheduled without blocking."""
+        from src.llm_interface import LLMFunctionInterface
+        
+        mock_background.side_effect = lambda coro: coro.close()
+        interface = LLMFunctionInterface(api_key="test-key", model="gpt-4")
+        
+        mock_background.assert_called_once()
+        
+        mock_openai.return_value.models.retrieve = AsyncMock(side_effect=RuntimeError("offline"))
+        mock_measurer_openai.return_value.chat.completions.create = AsyncMock(side_effect=RuntimeError("offline"))
+        asyncio.run(interface.awarmup())  # Errors are swallowed
+        mock_openai.return_value.models.retrieve.assert_awaited_once_with("gpt-4")
+    
+    @patch('src.measure_uncertainty.get_async_client')
+    @patch('src.llm_interface.get_async_client')
+    def test_warmup_uses_running_loop(self, mock_openai, mock_measurer_openai):
+        """Test that an interface built inside a coroutine warms up on that loop."""
+        from src.llm_interface import LLMFunctionInterface
+        
+        UncertaintyMeasurer.clear_baseline_cache()
+        mock_openai.return_value.models.retrieve = AsyncMock()
+        mock_measurer_openai.return_value = create_mock_client()
+        create = AsyncMock(return_value=create_mock_completion("I'm not sure", logprob=-2.0))
+        mock_measurer_openai.return_value.chat.completions.create = create
+        
+        async def build():
+            interface = LLMFunctionInterface(api_key="test-key", model="gpt-4")
+            await interface._warmup_task
+            return interface
+        
+        interface = asyncio.run(build())
+        mock_openai.return_value.models.retrieve.assert_awaited_once_with("gpt-4")
+        
+        # The uncertainty-phrase baseline was prefetched, so it is not queried again
+        self.assertEqual(create.await_count, 3)
+        asyncio.run(interface.uncertainty_measurer.aprefetch_baseline())
+        self.assertEqual(create.await_count, 3)
+    
+    @patch('src.llm_interface.run_in_background')
+    @patch('src.llm_interface.get_async_client')
+    def test_warmup_can_be_disabled(self, mock_openai, mock_background):
+        """Test that warmup=False skips the background request."""
+        from src.llm_interface import LLMFunctionInterface
+        
+        LLMFunctionInterface(api_key="test-key", warmup=False)
+        
+        mock_background.assert_not_called()
+    
+    def test_function_schema_is_read_only(self):
+        """Test that the shared schema cannot be modified by callers."""
+        from src.llm_interface import LLMFunctionInterface, MEASURE_UNCERTAINTY_FUNCTION
+        
+        self.assertIs(LLMFunctionInterface.MEASURE_UNCERTAINTY_FUNCTION, MEASURE_UNCERTAINTY_FUNCTION)
+        with self.assertRaises(TypeError):
+            MEASURE_UNCERTAINTY_FUNCTION["type"] = "other"
+
+
+class TestSharedClient(unittest.TestCase):
+    """Test the shared AsyncOpenAI client registry."""
+    
+    @patch('src._client.AsyncOpenAI')
+    def test_client_shared_per_key_and_loop(self, mock_openai):
+        """Test that one client is reused per credentials and event loop."""
+        from src._client import get_async_client
+        
+        mock_openai.side_effect = lambda **kwargs: Mock()
+        
+        first = get_async_client(api_key="shared-key")
+        self.assertIs(get_async_client(api_key="shared-key"), first)
+        self.assertIsNot(get_async_client(api_key="other-key"), first)
+        
+        async def in_loop():
+            return get_async_client(api_key="shared-key"), get_async_client(api_key="shared-key")
+        
+        loop_client, again = asyncio.run(in_loop())
+        self.assertIs(loop_client, again)
+        self.assertIsNot(loop_client, first)
+    
+    @patch('src._client.AsyncOpenAI')
+    def test_measurer_uses_client_of_running_loop(self, mock_openai):
+        """Test that a measurer built from sync code does not carry its client into another loop."""
+        from src._client import get_async_client
+        
+        mock_openai.side_effect = lambda **kwargs: Mock()
+        measurer = UncertaintyMeasurer(api_key="loop-key")
+        background_client = measurer.client
+        
+        async def in_loop():
+            return measurer.client, get_async_client(api_key="loop-key")
+        
+        loop_client, expected = asyncio.run(in_loop())
+        self.assertIs(loop_client, expected)
+        self.assertIsNot(loop_client, background_client)
+    
+    @patch('src._client.AsyncOpenAI')
+    def test_client_fails_fast(self, mock_openai):
+        """Test that clients use a bounded timeout and leave retries to tenacity."""
+        from src._client import REQUEST_TIMEOUT, get_async_client
+        
+        get_async_client(api_key="timeout-key")
+        
+        kwargs = mock_openai.call_args.kwargs
+        self.assertIs(kwargs["timeout"], REQUEST_TIMEOUT)
+        self.assertEqual(kwargs["max_retries"], 0)
+        self.assertIsNotNone(kwargs["http_client"])
+    
+    @patch('src._client.AsyncOpenAI')
+    def test_async_context_closes_client(self, mock_openai):
+        """Test that leaving ``async with`` closes the client and unregisters it."""
+        from src._client import get_async_client
+        
+        mock_openai.side_effect = lambda **kwargs: Mock(close=AsyncMock())
+        
+        async def run():
+            async with UncertaintyMeasurer(api_key="closing-key") as measurer:
+                client = measurer.client
+            return client, get_async_client(api_key="closing-key")
+        
+        closed, replacement = asyncio.run(run())
+        closed.close.assert_awaited_once()
+        self.assertIsNot(replacement, closed)
+    
+    @patch('src._client.AsyncOpenAI')
+    def test_interface_and_measurer_share_client(self, mock_openai):
+        """Test that an interface and its measurer use the same connection pool."""
+        from src.llm_interface import LLMFunctionInterface
+        
+        mock_openai.side_effect = lambda **kwargs: Mock()
+        
+        interface = LLMFunctionInterface(api_key="pool-key", warmup=False)
+        
+        self.assertIs(interface.client, interface.uncertainty_measurer.client)
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test the default in-memory cache backend."""
+    
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that reading an entry protects it from eviction."""
+        from src.cache import LRUCache
+        
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+    
+    def test_zero_size_stores_nothing(self):
+        """Test that a cache without room stays empty."""
+        from src.cache import LRUCache
+        
+        cache = LRUCache(max_entries=0)
+        cache.set("a", 1)
+        
+        self.assertIsNone(cache.get("a"))
+
+
+class TestSemanticUncertaintyCache(unittest.TestCase):
+    """Test the embedding-keyed uncertainty result cache."""
+    
+    def _embedding_response(self, vector):
+        """Create a mock embeddings response."""
+        return Mock(data=[Mock(embedding=vector)])
+    
+    def test_similar_prompt_hits(self):
+        """Test that a close embedding with the same parameters is a hit."""
+        from src.semantic_cache import SemanticUncertaintyCache
+        
+        client = Mock()
+        client.embeddings.create = AsyncMock(side_effect=[
+            self._embedding_response([3.0, 4.0, 0.0]),
+            self._embedding_response([0.61, 0.79, 0.0]),
+            self._embedding_response([0.0, 0.0, 1.0])
+        ])
+        cache = SemanticUncertaintyCache(client, threshold=0.92)
+        
+        stored = asyncio.run(cache.aembed("What is the capital of France?"))
+        self.assertAlmostEqual(float(np.linalg.norm(stored)), 1.0, places=5)
+        cache.add(stored, {"is_uncertain": False}, params=(5, 0.7, 1.0))
+        
+        paraphrase = asyncio.run(cache.aembed("capital of France?"))
+        self.assertEqual(cache.lookup(paraphrase, params=(5, 0.7, 1.0)), {"is_uncertain": False})
+        self.assertIsNone(cache.lookup(paraphrase, params=(3, 0.7, 1.0)))
+        
+        unrelated = asyncio.run(cache.aembed("How do magnets work?"))
+        self.assertIsNone(cache.lookup(unrelated, params=(5, 0.7, 1.0)))
+    
+    def test_oldest_entry_is_replaced(self):
+        """Test that the cache keeps at most max_entries results."""
+        from src.semantic_cache import SemanticUncertaintyCache
+        
+        cache = SemanticUncertaintyCache(Mock(), max_entries=2)
+        basis = np.eye(3, dtype=np.float32)
+        for i in range(3):
+            cache.add(basis[i], {"id": i})
+        
+        self.assertIsNone(cache.lookup(basis[0]))
+        self.assertEqual(cache.lookup(basis[1]), {"id": 1})
+        self.assertEqual(cache.lookup(basis[2]), {"id": 2})
+
+
+class TestLLMFunctionInterface(unittest.TestCase):
+    """Test the conversation flow of LLMFunctionInterface."""
+    
+    def setUp(self):
+        """Start each test without cached uncertainty-phrase logprobs."""
+        UncertaintyMeasurer.clear_baseline_cache()
+    
+    def _tool_call_response(self, prompt, cached_tokens=None, **extra_args):
+        """Create a mock stream that calls measure_uncertainty in small argument pieces."""
+        arguments = json.dumps(dict(prompt=prompt, **extra_args))
+        chunks = []
+        for start in range(0, len(arguments), 4):
+            tool_call = Mock(index=0, id="call_1" if start == 0 else None)
+            tool_call.function.name = "measure_uncertainty" if start == 0 else None
+            tool_call.function.arguments = arguments[start:start + 4]
+            choice = Mock()
+            choice.delta.content = None
+            choice.delta.tool_calls = [tool_call]
+            chunks.append(Mock(choices=[choice], usage=None))
+        if cached_tokens is not None:
+            usage_chunk = Mock(choices=[])
+            usage_chunk.usage.prompt_tokens_details.cached_tokens = cached_tokens
+            chunks.append(usage_chunk)
+        return MockStream(chunks)
+    
+    def _final_response(self, text):
+        """Create a mock completion with a plain assistant message."""
+        response = Mock()
+        response.choices = [Mock()]
+        response.choices[0].message.content = text
+        return response
+    
+    @patch('src.llm_interface.get_async_client')
+    def test_repeated_question_is_served_from_cache(self, mock_openai):
+        """Test that a repeated question in the same conversation state makes no API calls."""
+        from src.llm_interface import LLMFunctionInterface
+        
+        interface = LLMFunctionInterface(api_key="test-key", warmup=False, skip_second_call=False)
+        create = AsyncMock(side_effect=[
+            self._tool_call_response("What is the capital of France?"),
+            self._final_response("Paris."),
+        ])
+        interface.client.chat.completions.create = create
+        interface.uncertainty_measurer.ameasure_uncertainty = AsyncMock(return_value={
+            "uncertainty_analysis": {"uncertainty_level": "low"},
+            "is_uncertain": False,
+            "tool_response": "Paris."
+        })
+        interface.uncertainty_measurer.format_results = Mock(return_value="formatted")
+        
+        first = interface.process_user_message("What is the capital of France?")
+        history = list(interface.conversation_history)
+        
+        interface.conversation_history = []
+        second = interface.process_user_message("  what is the   capital of France?")
+        
+        self.assertIs(second, first)
+        self.assertEqual(create.await_count, 2)
+        self.assertEqual(interface.uncertainty_measurer.ameasure_uncertainty.await_count, 1)
+        self.assertEqual(interface.conversation_history, history)
+    
+    @patch('src.llm_interface.get_async_client')
+    def test_turns_extend_a_stable_prefix(self, mock_openai):
+        """Test that every request starts with the same system message and counts cached tokens."""
+        from src.llm_interface import LLMFunctionInterface, SYSTEM_MESSAGE
+        
+        interface = LLMFunctionInterface(api_key="test-key", warmup=False, cache_size=0)
+        sent = []
+        responses = []
+        for text in ("Paris.", "Berlin."):
+            tool_call = self._tool_call_response("Capital?", cached_tokens=0)
+            final = self._final_response(text)
+            final.usage.prompt_tokens_details.cached_tokens = 1024
+            responses += [tool_call, final]
+        
+        async def create(**kwargs):
+            sent.append(list(kwargs["messages"]))
+            return responses.pop(0)
+        
+        interface.client.chat.completions.create = create
+        interface.uncertainty_measurer.ameasure_uncertainty = AsyncMock(return_value={
+            "uncertainty_analysis": {}, "is_uncertain": False, "tool_response": ""
+        })
+        interface.uncertainty_measurer.format_results = Mock(return_value="formatted")
+        
+        interface.process_user_message("Capital of France?")
+        interface.process_user_message("Capital of Germany?")
+        
+        self.assertTrue(all(messages[0] is SYSTEM_MESSAGE for messages in sent))
+        # Each request extends the previous one instead of rebuilding it
+        self.assertEqual(sent[2][:len(sent[1])], sent[1])
+        self.assertEqual(interface.cached_tokens, 2048)
+        
+        interface.reset_conversation()
+        self.assertEqual(interface.conversation_history, [])
+        self.assertEqual(interface.cached_tokens, 0)
+    
+    def test_tool_result_has_stable_preamble(self):
+        """Test that tool results start with fixed text and carry only a compact summary."""
+        from src.llm_interface import _tool_result_content
+        
+        content = _tool_result_content({
+            "uncertainty_analysis": {
+                "uncertainty_level": "low",
+                "certainty_ratio": 0.123456,
+                "uncertainty_phrase_logprobs": {"I'm not sure": -2.0}
+            },
+            "is_uncertain": False,
+            "tool_response": "Paris."
+        })
+        
+        preamble, payload = content.split("\n", 1)
+        self.assertEqual(preamble, "Uncertainty tool completed. See metrics below:")
+        self.assertEqual(json.loads(payload), {
+            "is_uncertain": False,
+            "tool_response": "Paris.",
+            "uncertainty_level": "low",
+            "certainty_ratio": 0.12
+        })
+    
+    @patch('src.llm_interface.get_async_client')
+    def test_confident_answer_skips_second_call(self, mock_openai):
+        """Test that a confident measurement is returned without a second completion."""
+        from src.llm_interface import LLMFunctionInterface
+        
+        interface = LLMFunctionInterface(api_key="test-key", warmup=False)
+        create = AsyncMock(side_effect=[
+            self._tool_call_response("Capital of France?"),
+            self._tool_call_response("Meaning of life?"),
+            self._final_response("It depends on who you ask.")
+        ])
+        interface.client.chat.completions.create = create
+        interface.uncertainty_measurer.ameasure_uncertainty = AsyncMock(side_effect=[
+            {"uncertainty_analysis": {"uncertainty_level": "low"}, "is_uncertain": False, "tool_response": "Paris."},
+            {"uncertainty_analysis": {"uncertainty_level": "high"}, "is_uncertain": True, "tool_response": "Which sense?"}
+        ])
+        interface.uncertainty_measurer.format_results = Mock(return_value="formatted")
+        
+        confident = interface.process_user_message("Capital of France?")
+        uncertain = interface.process_user_message("Meaning of life?")
+        
+        self.assertEqual(confident["assistant_response"], "Paris.\n\n(Confidence: low)")
+        self.assertEqual(uncertain["assistant_response"], "It depends on who you ask.")
+        self.assertEqual(create.await_count, 3)
+    
+    @patch('src.llm_interface.get_async_client')
+    def test_measurement_starts_while_arguments_stream(self, mock_openai):
+        """Test that sampling starts once the prompt argument is complete."""
+        from src.llm_interface import LLMFunctionInterface
+        
+        interface = LLMFunctionInterface(api_key="test-key", warmup=False, router_model="small-model")
+        stream = self._tool_call_response("Capital of France?", temperature=0.7)
+        interface.client.chat.completions.create = AsyncMock(return_value=stream)
+        consumed_at_start = []
+        
+        async def measure(**kwargs):
+            consumed_at_start.append(stream.consumed)
+            return {"uncertainty_analysis": {"uncertainty_level": "low"}, "is_uncertain": False, "tool_response": "Paris."}
+        
+        interface.uncertainty_measurer.ameasure_uncertainty = AsyncMock(side_effect=measure)
+        interface.uncertainty_measurer.format_results = Mock(return_value="formatted")
+        
+        result = interface.process_user_message("Capital of France?")
+        
+        self.assertEqual(result["function_args"], {"prompt": "Capital of France?", "temperature": 0.7})
+        self.assertEqual(len(consumed_at_start), 1)
+        self.assertLess(consumed_at_start[0], len(stream.chunks))
+        self.assertTrue(interface.client.chat.completions.create.await_args.kwargs["stream"])
+        self.assertEqual(interface.client.chat.completions.create.await_args.kwargs["model"], "small-model")
+    
+    @patch('src.llm_interface.get_async_client')
+    def test_speculative_measurement_redone_for_other_arguments(self, mock_openai):
+        """Test that non-default arguments after the prompt trigger a fresh measurement."""
+        from src.llm_interface import LLMFunctionInterface
+        
+        interface = LLMFunctionInterface(api_key="test-key", warmup=False)
+        interface.client.chat.completions.create = AsyncMock(
+            return_value=self._tool_call_response("Capital of France?", num_samples=10)
+        )
+        interface.uncertainty_measurer.ameasure_uncertainty = AsyncMock(return_value={
+            "uncertainty_analysis": {"uncertainty_level": "low"}, "is_uncertain": False, "tool_response": "Paris."
+        })
+        interface.uncertainty_measurer.format_results = Mock(return_value="formatted")
+        
+        interface.process_user_message("Capital of France?")
+        
+        last_call = interface.uncertainty_measurer.ameasure_uncertainty.await_args_list[-1]
+        self.assertEqual(last_call.kwargs["num_samples"], 10)
+    
+    @patch('src.llm_interface.get_async_client')
+    def test_speculative_measurement_cancelled_when_stream_fails(self, mock_openai):
+        """Test that a stream error does not leave the started measurement running."""
+        from src.llm_interface import LLMFunctionInterface
+        
+        interface = LLMFunctionInterface(api_key="test-key", warmup=False)
+        stream = self._tool_call_response("Capital of France?", temperature=0.7)
+        stream.chunks.append(RuntimeError("connection reset"))
+        interface.client.chat.completions.create = AsyncMock(return_value=stream)
+        cancelled = []
+        
+        async def measure(**kwargs):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        
+        interface.uncertainty_measurer.ameasure_uncertainty = AsyncMock(side_effect=measure)
+        
+        async def process():
+            with self.assertRaises(RuntimeError):
+                await interface.aprocess_user_message("Capital of France?")
+            # Checked before asyncio.run cancels leftover tasks on exit
+            self.assertEqual(cancelled, [True])
+        
+        asyncio.run(process())
+
+    
+    @patch('src.llm_interface.get_async_client')
+    def test_speculative_measurement_cancelled_on_malformed_arguments(self, mock_openai):
+        """Test that arguments failing to parse do not leave the started measurement running."""
+        from src.llm_interface import LLMFunctionInterface
+        
+        interface = LLMFunctionInterface(api_key="test-key", warmup=False)
+        stream = self._tool_call_response("Capital of France?")
+        # The prompt argument is complete, but the arguments are not valid JSON
+        stream.chunks[-1].choices[0].delta.tool_calls[0].function.arguments += "}"
+        interface.client.chat.completions.create = AsyncMock(return_value=stream)
+        cancelled = []
+        
+        async def measure(**kwargs):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        
+        interface.uncertainty_measurer.ameasure_uncertainty = AsyncMock(side_effect=measure)
+        
+        async def process():
+            with self.assertRaises(ValueError):
+                await interface.aprocess_user_message("Capital of France?")
+            # Checked before asyncio.run cancels leftover tasks on exit
+            self.assertEqual(cancelled, [True])
+        
+        asyncio.run(process())
 
 
 if __name__ == "__main__":